@@ -26,7 +26,7 @@ class JisshuxBot(Client):
 
     def __init__(self):
         super().__init__(
-            name=SESSION,
+            name=SESSION if WORKER_COUNT == 1 else f"{SESSION}_{WORKER_ID}",
             api_id=API_ID,
             api_hash=API_HASH,
             bot_token=BOT_TOKEN,
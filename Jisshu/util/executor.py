@@ -0,0 +1,85 @@
+import asyncio
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from info import CPU_WORKERS, IO_WORKERS
+
+# task name -> [calls, total seconds, max seconds], measured from submit to
+# result so time spent waiting for a free worker is included
+TASK_STATS = {}
+_process_pool = None
+_thread_pool = None
+
+
+def start_process_pool():
+    """Fork the CPU workers. Call once at startup, before database clients or
+    any other threads exist: a forked child only gets the forking thread, so
+    a lock held by another thread at that moment would never be released."""
+    global _process_pool
+    if _process_pool is not None or CPU_WORKERS <= 0:
+        return
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return
+    # fork, because spawn and forkserver would re-run bot.py in every worker
+    context = multiprocessing.get_context("fork")
+    pool = ProcessPoolExecutor(CPU_WORKERS, mp_context=context)
+    # workers are created on the first submit, with fork all of them at once
+    pool.submit(os.getpid).result()
+    _process_pool = pool
+
+
+def process_pool():
+    """Pool for CPU bound work, None when disabled, not started or broken"""
+    return _process_pool
+
+
+def thread_pool():
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(IO_WORKERS, thread_name_prefix="io")
+    return _thread_pool
+
+
+async def timed(name, future):
+    start = time.perf_counter()
+    try:
+        return await future
+    finally:
+        took = time.perf_counter() - start
+        stats = TASK_STATS.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += took
+        stats[2] = max(stats[2], took)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Run func in the process pool. func and its arguments must be picklable,
+    i.e. a module level function of a regular module and plain values."""
+    global _process_pool
+    loop = asyncio.get_running_loop()
+    pool = process_pool() or thread_pool()
+    task = partial(func, *args, **kwargs)
+    try:
+        return await timed(func.__qualname__, loop.run_in_executor(pool, task))
+    except BrokenProcessPool:
+        # a worker died. Forking a new pool now would copy the running
+        # threads' locks, so CPU work stays on threads from here on
+        _process_pool = None
+        return await run_io(func, *args, **kwargs)
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking func in the thread pool"""
+    loop = asyncio.get_running_loop()
+    task = partial(func, *args, **kwargs)
+    return await timed(func.__qualname__, loop.run_in_executor(thread_pool(), task))
+
+
+def task_stats():
+    return {
+        name: {"calls": calls, "avg": total / calls, "max": longest}
+        for name, (calls, total, longest) in TASK_STATS.items()
+    }
@@ -0,0 +1,73 @@
+from functools import lru_cache
+from string import Formatter
+
+# Placeholders a group may use in /set_template, the IMDb details returned by
+# get_poster plus what auto_filter passes along with them. Only these exact
+# names are accepted, so a template cannot walk into other attributes.
+IMDB_FIELDS = frozenset(
+    """query search total_results title votes aka seasons box_office
+    localized_title kind imdb_id cast runtime countries certificates languages
+    director writer producer composer cinematographer music_team distributors
+    release_date year genres poster plot rating url message.from_user.mention
+    message.from_user.first_name message.from_user.username message.from_user.id
+    message.chat.title message.chat.id""".split()
+)
+# Placeholders a group may use in /set_caption
+CAPTION_FIELDS = frozenset(["file_name", "file_size", "file_caption"])
+
+formatter = Formatter()
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Template:
+    """A template parsed once, rendering only the fields it references"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.fields = frozenset(name for _, name, _, _ in parts if name is not None)
+
+    def render(self, values):
+        """Fill in values, any failure (e.g. a message without from_user) is
+        raised as TemplateError"""
+        out = []
+        try:
+            for literal, name, _, conversion in self.parts:
+                out.append(literal)
+                if name is None:
+                    continue
+                value = formatter.get_field(name, (), values)[0]
+                if conversion:
+                    value = formatter.convert_field(value, conversion)
+                out.append(str(value))
+        except Exception as e:
+            raise TemplateError(f"{type(e).__name__}: {e}") from None
+        return "".join(out)
+
+
+@lru_cache(maxsize=512)
+def compile_template(template, fields):
+    """Parse template, raising TemplateError if it is malformed, uses a
+    placeholder that is not in fields, a format spec or an unknown conversion"""
+    try:
+        parts = list(formatter.parse(template))
+    except ValueError as e:
+        raise TemplateError(str(e)) from None
+    for _, name, spec, conversion in parts:
+        if name is None:
+            continue
+        if not name or name.isdigit():
+            raise TemplateError("positional placeholders like {} are not allowed")
+        if name not in fields:
+            raise TemplateError(f"unknown placeholder {{{name}}}")
+        if spec:
+            raise TemplateError(f"format specs are not allowed in {{{name}}}")
+        if conversion not in (None, "s", "r", "a"):
+            raise TemplateError(f"unknown conversion !{conversion} in {{{name}}}")
+    return Template(parts)
+
+
+def render_template(template, fields, values):
+    return compile_template(template, fields).render(values)
@@ -0,0 +1,130 @@
+import re
+
+# Pure text helpers for channel posts, kept in a regular module so they can be
+# sent to the process pool (see Jisshu/util/executor.py)
+
+CAPTION_LANGUAGES = [
+    "Bhojpuri",
+    "Hindi",
+    "Bengali",
+    "Tamil",
+    "English",
+    "Bangla",
+    "Telugu",
+    "Malayalam",
+    "Kannada",
+    "Marathi",
+    "Punjabi",
+    "Bengoli",
+    "Gujrati",
+    "Korean",
+    "Gujarati",
+    "Spanish",
+    "French",
+    "German",
+    "Chinese",
+    "Arabic",
+    "Portuguese",
+    "Russian",
+    "Japanese",
+    "Odia",
+    "Assamese",
+    "Urdu",
+]
+
+
+def clean_movie_name(file_name):
+    return re.sub(
+        r"http\S+",
+        "",
+        re.sub(r"@\w+|#\w+", "", file_name)
+        .replace("_", " ")
+        .replace("[", "")
+        .replace("]", "")
+        .replace("(", "")
+        .replace(")", "")
+        .replace("{", "")
+        .replace("}", "")
+        .replace(".", " ")
+        .replace("@", "")
+        .replace(":", "")
+        .replace(";", "")
+        .replace("'", "")
+        .replace("-", "")
+        .replace("!", ""),
+    ).strip()
+
+
+def get_qualities(text):
+    qualities = [
+        "480p",
+        "720p",
+        "720p HEVC",
+        "1080p",
+        "ORG",
+        "org",
+        "hdcam",
+        "HDCAM",
+        "HQ",
+        "hq",
+        "HDRip",
+        "hdrip",
+        "camrip",
+        "WEB-DL",
+        "CAMRip",
+        "hdtc",
+        "predvd",
+        "DVDscr",
+        "dvdscr",
+        "dvdrip",
+        "HDTC",
+        "dvdscreen",
+        "HDTS",
+        "hdts",
+    ]
+    found_qualities = [q for q in qualities if q.lower() in text.lower()]
+    return ", ".join(found_qualities) or "HDRip"
+
+
+def Jisshu_qualities(text, file_name):
+    qualities = ["480p", "720p", "720p HEVC", "1080p", "1080p HEVC", "2160p"]
+    combined_text = (text.lower() + " " + file_name.lower()).strip()
+    if "hevc" in combined_text:
+        for quality in qualities:
+            if "HEVC" in quality and quality.split()[0].lower() in combined_text:
+                return quality
+    for quality in qualities:
+        if "HEVC" not in quality and quality.lower() in combined_text:
+            return quality
+    return "720p"
+
+
+def parse_movie_file(file_name, caption):
+    """Title, year, qualities and languages of a channel post"""
+    raw_name = file_name
+    file_name = clean_movie_name(file_name)
+    caption = clean_movie_name(caption)
+    year_match = re.search(r"\b(19|20)\d{2}\b", caption)
+    year = year_match.group(0) if year_match else None
+    season_match = re.search(r"(?i)(?:s|season)0*(\d{1,2})", caption) or re.search(
+        r"(?i)(?:s|season)0*(\d{1,2})", file_name
+    )
+    if year:
+        file_name = file_name[: file_name.find(year) + 4]
+    elif season_match:
+        season = season_match.group(1)
+        file_name = file_name[: file_name.find(season) + 1]
+    language = (
+        ", ".join(
+            [lang for lang in CAPTION_LANGUAGES if lang.lower() in caption.lower()]
+        )
+        or "Not Idea"
+    )
+    return {
+        "file_name": file_name,
+        "caption": caption,
+        "year": year,
+        "quality": get_qualities(caption) or "HDRip",
+        "jisshuquality": Jisshu_qualities(caption, raw_name) or "720p",
+        "language": language,
+    }
@@ -17,18 +17,32 @@ logging.basicConfig(
 logging.getLogger("aiohttp").setLevel(logging.ERROR)
 logging.getLogger("aiohttp.web").setLevel(logging.ERROR)
 
+# before the imports below create database clients and their threads
+from Jisshu.util.executor import start_process_pool
+
+start_process_pool()
 
 from pyrogram import __version__
 from pyrogram.raw.all import layer
-from database.ia_filterdb import Media
+from database.ia_filterdb import (
+    Media,
+    build_search_index,
+    build_title_index,
+    refresh_title_index,
+    check_media_fields,
+    wait_for_media_fields,
+)
 from database.users_chats_db import db
+from database.sessions import sessions, MemoryStore
+from database.imdb_cache import imdb_cache
+from database.user_state import user_state
 from info import *
-from utils import temp
+from utils import temp, watch_settings
 from Script import script
 from datetime import date, datetime
 import pytz
 from aiohttp import web
-from plugins import web_server, check_expired_premium
+from plugins import web_server, check_expired_premium, prefetch_imdb
 import pyrogram.utils
 import asyncio
 from Jisshu.bot import JisshuBot
@@ -48,7 +62,8 @@ async def Jisshu_start():
     print("Credit - Telegram @JISSHU_BOTS")
     bot_info = await JisshuBot.get_me()
     JisshuBot.username = bot_info.username
-    await initialize_clients()
+    if WORKER_ID == 0:
+        await initialize_clients()
     for name in files:
         with open(name) as a:
             patt = Path(a.name)
@@ -60,22 +75,49 @@ async def Jisshu_start():
             spec.loader.exec_module(load)
             sys.modules["plugins." + plugin_name] = load
             print("JisshuBot Imported => " + plugin_name)
-    if ON_HEROKU:
+    if ON_HEROKU and WORKER_ID == 0:
         asyncio.create_task(ping_server())
     b_users, b_chats = await db.get_banned()
     temp.BANNED_USERS = b_users
     temp.BANNED_CHATS = b_chats
     await Media.ensure_indexes()
+    await sessions.ensure_indexes()
+    await imdb_cache.ensure_indexes()
+    await user_state.ensure_indexes()
+    if WORKER_COUNT > 1 and isinstance(sessions, MemoryStore):
+        logging.warning(
+            "Worker mode with the memory session store, callbacks of other "
+            "workers will not be found. Set SESSION_BACKEND to mongo or redis."
+        )
+    if not await check_media_fields():
+        logging.info("Some files miss the search fields, run /backfill to add them.")
+        if WORKER_COUNT > 1:
+            JisshuBot.loop.create_task(wait_for_media_fields())
+    if SEARCH_BACKEND == "index":
+        total = await build_search_index()
+        logging.info(f"Search index built with {total} files.")
+    total = await build_title_index()
+    logging.info(f"Spell check index built with {total} titles.")
+    if WORKER_COUNT > 1:
+        JisshuBot.loop.create_task(refresh_title_index())
+    if SETTINGS_WATCH:
+        JisshuBot.loop.create_task(watch_settings())
     me = await JisshuBot.get_me()
     temp.ME = me.id
     temp.U_NAME = me.username
     temp.B_NAME = me.first_name
     temp.B_LINK = me.mention
     JisshuBot.username = "@" + me.username
-    JisshuBot.loop.create_task(check_expired_premium(JisshuBot))
     logging.info(
         f"{me.first_name} with for Pyrogram v{__version__} (Layer {layer}) started on {me.username}."
     )
+    if WORKER_ID != 0:
+        logging.info(f"Worker {WORKER_ID}/{WORKER_COUNT} started.")
+        await idle()
+        return
+    JisshuBot.loop.create_task(check_expired_premium(JisshuBot))
+    if IMDB_PREFETCH:
+        JisshuBot.loop.create_task(prefetch_imdb())
     logging.info(script.LOGO)
     tz = pytz.timezone("Asia/Kolkata")
     today = date.today()
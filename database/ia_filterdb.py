@@ -1,16 +1,51 @@
 from struct import pack
+import asyncio
 import re
+import time
 import base64
+from collections import OrderedDict
+from functools import lru_cache
 from pyrogram.file_id import FileId
+from pymongo import UpdateOne, IndexModel, DESCENDING
 from pymongo.errors import DuplicateKeyError
 from umongo import Instance, Document, fields
 from motor.motor_asyncio import AsyncIOMotorClient
 from marshmallow.exceptions import ValidationError
-from info import FILES_DATABASE, DATABASE_NAME, COLLECTION_NAME, MAX_BTN
+from info import (
+    FILES_DATABASE,
+    DATABASE_NAME,
+    COLLECTION_NAME,
+    MAX_BTN,
+    SEARCH_BACKEND,
+    SINGLE_PASS_SEARCH,
+    SEARCH_COUNT_LIMIT,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    RANK_RESULTS,
+    RANK_WINDOW,
+)
+from database.search_index import TokenIndex, TrigramIndex, tokenize
+from database.media_fields import extract_media_fields, extract_title, facet_regex
+from database.ranking import rank_files
+from Jisshu.util.cache import TTLCache
 
 client = AsyncIOMotorClient(FILES_DATABASE)
 mydb = client[DATABASE_NAME]
 instance = Instance.from_db(mydb)
+search_index = TokenIndex()
+title_index = TrigramIndex()
+search_cache = TTLCache("search", SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+FIELDS_READY = False
+# (session, search, page size, offset) -> (seq, _id) of the last file on the
+# previous page, only ever reused by the session that saved it
+PAGE_CURSORS = OrderedDict()
+MAX_PAGE_CURSORS = 10000
+# backfilled files are numbered from 1, saved ones get time_ns, so any seq
+# below this was given by backfill_media_fields
+BACKFILL_SEQ_LIMIT = 10**15
+MISSING_FIELDS = {
+    "$or": [{"tokens": {"$exists": False}}, {"seq": {"$exists": False}}]
+}
 
 
 @instance.register
@@ -22,9 +57,25 @@ class Media(Document):
     mime_type = fields.StrField(allow_none=True)
     caption = fields.StrField(allow_none=True)
     file_type = fields.StrField(allow_none=True)
+    tokens = fields.ListField(fields.StrField(), allow_none=True)
+    year = fields.IntField(allow_none=True)
+    season = fields.IntField(allow_none=True)
+    episode = fields.IntField(allow_none=True)
+    quality = fields.ListField(fields.StrField(), allow_none=True)
+    languages = fields.ListField(fields.StrField(), allow_none=True)
+    codec = fields.StrField(allow_none=True)
+    seq = fields.IntField(allow_none=True)
 
     class Meta:
-        indexes = ("$file_name",)
+        indexes = (
+            "$file_name",
+            "tokens",
+            "year",
+            "season",
+            "quality",
+            "languages",
+            IndexModel([("seq", DESCENDING), ("_id", DESCENDING)]),
+        )
         collection_name = COLLECTION_NAME
 
 
@@ -47,6 +98,8 @@ async def save_file(media):
             mime_type=media.mime_type,
             caption=media.caption.html if media.caption else None,
             file_type=media.mime_type.split("/")[0],
+            seq=time.time_ns(),
+            **extract_media_fields(file_name),
         )
     except ValidationError:
         print("Error occurred while saving file in database")
@@ -60,57 +113,433 @@ async def save_file(media):
             )
             return "dup"
         else:
+            if search_index.ready:
+                search_index.add(file_id, file_name)
+            if title_index.ready:
+                title_index.add(extract_title(file_name))
+            invalidate_search_cache(file_name)
             print(f'{getattr(media, "file_name", "NO_FILE")} is saved to database')
             return "suc"
 
 
-async def get_search_results(query, max_results=MAX_BTN, offset=0, lang=None):
+async def build_search_index():
+    """Load every file name of the Media collection into the token index"""
+    search_index.ready = False
+    search_index.clear()
+    cursor = Media.collection.find({}, {"file_name": 1})
+    async for doc in cursor:
+        search_index.add(doc["_id"], doc.get("file_name", ""))
+    search_index.ready = True
+    return len(search_index)
+
+
+async def build_title_index():
+    """Load the distinct titles of the Media collection into a new trigram
+    index and swap it in, so suggestions keep working during a rebuild"""
+    global title_index
+    index = TrigramIndex()
+    cursor = Media.collection.find({}, {"file_name": 1, "_id": 0})
+    async for doc in cursor:
+        index.add(extract_title(doc.get("file_name", "")))
+    index.ready = True
+    title_index = index
+    return len(title_index)
+
+
+async def refresh_title_index(interval=3600):
+    """Rebuild the title index now and then. In worker mode a new file is only
+    added to the index of the worker that saved it."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await build_title_index()
+        except Exception as e:
+            print(f"Title index refresh failed: {e}")
+
+
+def suggest_titles(query, limit=5):
+    """Indexed titles closest to query as (title, score)"""
+    if not title_index.ready:
+        return []
+    return title_index.suggest(query, limit)
+
+
+async def check_media_fields():
+    """Use the normalized fields for filters once no file is missing them"""
+    global FIELDS_READY
+    missing = await Media.collection.find_one(MISSING_FIELDS, {"_id": 1})
+    FIELDS_READY = missing is None
+    return FIELDS_READY
+
+
+async def wait_for_media_fields(interval=60):
+    """Pick up a /backfill run by another worker, FIELDS_READY is only set in
+    the process that ran it"""
+    while not FIELDS_READY:
+        await asyncio.sleep(interval)
+        try:
+            await check_media_fields()
+        except Exception as e:
+            print(f"Search fields check failed: {e}")
+
+
+async def backfill_media_fields(batch_size=1000):
+    """Populate the normalized search fields on files saved before they existed"""
+    global FIELDS_READY
+    updated = 0
+    requests = []
+    # old files get small sequence numbers in insertion order, new ones use
+    # time_ns, so sorting by seq keeps the newest files first. A run after an
+    # interrupted one continues the numbering instead of reusing it.
+    last = await Media.collection.find_one(
+        {"seq": {"$lt": BACKFILL_SEQ_LIMIT}}, {"seq": 1}, sort=[("seq", -1)]
+    )
+    seq = last["seq"] + 1 if last else 1
+    cursor = Media.collection.find(MISSING_FIELDS, {"file_name": 1, "seq": 1})
+    cursor.hint([("$natural", 1)])
+    async for doc in cursor:
+        values = extract_media_fields(doc.get("file_name", ""))
+        if doc.get("seq") is None:
+            values["seq"] = seq
+            seq += 1
+        requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": values}))
+        if len(requests) >= batch_size:
+            result = await Media.collection.bulk_write(requests, ordered=False)
+            updated += result.modified_count
+            requests = []
+    if requests:
+        result = await Media.collection.bulk_write(requests, ordered=False)
+        updated += result.modified_count
+    FIELDS_READY = True
+    return updated
+
+
+def get_page_cursor(page_key, offset):
+    if not FIELDS_READY or page_key[0] is None:
+        return None
+    return PAGE_CURSORS.get((page_key, offset))
+
+
+def save_page_cursor(page_key, offset, file):
+    if not FIELDS_READY or page_key[0] is None or file.seq is None:
+        return
+    PAGE_CURSORS[(page_key, offset)] = (file.seq, file.file_id)
+    PAGE_CURSORS.move_to_end((page_key, offset))
+    while len(PAGE_CURSORS) > MAX_PAGE_CURSORS:
+        PAGE_CURSORS.popitem(last=False)
+
+
+def after_cursor(after):
+    """Keyset condition for files sorted after (seq, _id)"""
+    seq, file_id = after
+    return {
+        "$or": [{"seq": {"$lt": seq}}, {"seq": seq, "_id": {"$lt": file_id}}]
+    }
+
+
+def get_facet_filter(facets):
+    conditions = []
+    for field, value in facets.items():
+        if FIELDS_READY:
+            conditions.append({field: value})
+        else:
+            conditions.append({"file_name": facet_regex(field, value)})
+    return conditions
+
+
+def invalidate_search_cache(file_name):
+    """Drop cached searches whose query words all occur in file_name.
+
+    The regex search matches words as substrings, so this errs on the side of
+    dropping a few pages too many rather than serving a stale one.
+    """
+    name = str(file_name).lower()
+    for key, (words, _) in search_cache.items():
+        if all(word in name for word in words):
+            search_cache.pop(key)
+
+
+async def delete_files(filter):
+    """Delete matching files from database and drop them from the search index"""
+    docs = [doc async for doc in Media.collection.find(filter, {"file_name": 1})]
+    if not docs:
+        return 0
+    result = await Media.collection.delete_many(
+        {"_id": {"$in": [doc["_id"] for doc in docs]}}
+    )
+    for doc in docs:
+        search_index.remove(doc["_id"])
+        title_index.remove(extract_title(doc.get("file_name", "")))
+        invalidate_search_cache(doc.get("file_name", ""))
+    return result.deleted_count
+
+
+async def delete_all_files():
+    await Media.collection.drop()
+    search_index.clear()
+    title_index.clear()
+    search_cache.clear()
+
+
+async def get_files_by_ids(ids):
+    """Media documents for ids in one query, in the order of ids"""
+    cursor = Media.find({"file_id": {"$in": ids}})
+    docs = {file.file_id: file async for file in cursor}
+    return [docs[i] for i in ids if i in docs]
+
+
+async def get_index_results(query, max_results=MAX_BTN, offset=0, lang=None):
+    ids = search_index.search(query)
+    if lang:
+        ids = [i for i in ids if any(lang in t for t in search_index.tokens[i])]
+    total_results = len(ids)
+    files = await get_files_by_ids(ids[offset:][:max_results])
+    next_offset = offset + max_results
+    if next_offset >= total_results:
+        next_offset = ""
+    return files, next_offset, total_results
+
+
+async def get_facet_results(filter, max_results=MAX_BTN, offset=0, after=None):
+    """Fetch one page and the (capped) total count in a single aggregation.
+
+    The sort runs before $facet so it can use the (seq, _id) index. A page
+    after a keyset cursor is a separate indexed find next to the count.
+    """
+    count_limit = max(SEARCH_COUNT_LIMIT, offset + max_results + 1)
+    total = [{"$match": filter}, {"$limit": count_limit}, {"$count": "count"}]
+    if after:
+        cursor = Media.find({"$and": [filter, after_cursor(after)]})
+        cursor.sort([("seq", -1), ("_id", -1)])
+        cursor.limit(max_results)
+        files, counts = await asyncio.gather(
+            cursor.to_list(length=max_results),
+            Media.collection.aggregate(total).to_list(length=1),
+        )
+        return files, counts[0]["count"] if counts else 0
+    pipeline = [{"$match": filter}]
+    if FIELDS_READY:
+        pipeline.append({"$sort": {"seq": -1, "_id": -1}})
+    # stop reading after count_limit matches, the page lies within them
+    pipeline.append({"$limit": count_limit})
+    pipeline.append(
+        {
+            "$facet": {
+                "files": [{"$skip": offset}, {"$limit": max_results}],
+                "total": [{"$count": "count"}],
+            }
+        }
+    )
+    if FIELDS_READY:
+        cursor = Media.collection.aggregate(pipeline)
+    else:
+        cursor = Media.collection.aggregate(pipeline, hint={"$natural": -1})
+    result = (await cursor.to_list(length=1))[0]
+    files = [Media.build_from_mongo(doc) for doc in result["files"]]
+    total_results = result["total"][0]["count"] if result["total"] else 0
+    return files, total_results
+
+
+async def get_search_results(
+    query, max_results=MAX_BTN, offset=0, lang=None, facets=None, session=None
+):
+    """Page of files for query. session identifies the result message paging
+    through it, so its next page can continue from its own last file."""
     query = query.strip()
-    if not query:
-        raw_pattern = "."
-    elif " " not in query:
-        raw_pattern = r"(\b|[\.\+\-_])" + query + r"(\b|[\.\+\-_])"
+    key = (
+        " ".join(query.lower().split()),
+        offset,
+        max_results,
+        lang,
+        tuple(sorted((facets or {}).items())),
+    )
+    result = search_cache.get(key)
+    if result is not None:
+        return result[1]
+    window = -(-RANK_WINDOW // max_results) * max_results
+    if RANK_RESULTS and tokenize(query) and offset < window:
+        result = await get_ranked_results(key, query, window, lang, facets)
     else:
-        raw_pattern = query.replace(" ", r".*[\s\.\+\-_]")
-    try:
+        result = await search_files(
+            query, max_results, offset, lang, facets, session
+        )
+    search_cache.set(key, (tokenize(query), result))
+    return result
+
+
+async def get_ranked_results(key, query, window, lang, facets):
+    """Page through the first matches ordered by relevance.
+
+    The window is a whole number of pages, so later pages simply continue in
+    upload order from where the ranked window ends.
+    """
+    search, offset, max_results = key[:3]
+    ranked = search_cache.get((search, "ranked", window, lang, key[4]))
+    if ranked is None:
+        files, _, total_results = await search_files(query, window, 0, lang, facets)
+        ranked = (tokenize(query), (rank_files(query, files), total_results))
+        search_cache.set((search, "ranked", window, lang, key[4]), ranked)
+    files, total_results = ranked[1]
+    next_offset = offset + max_results
+    if next_offset >= total_results:
+        next_offset = ""
+    return files[offset:][:max_results], next_offset, total_results
+
+
+@lru_cache(maxsize=4096)
+def get_query_filter(query, use_tokens=False):
+    """Compiled file_name regex and Mongo filter for a search query.
+
+    User input is escaped, so stray regex characters are matched literally,
+    and a query without any letter or digit (e.g. "(" or "*") matches nothing
+    instead of scanning the collection. A single word, or a single word with
+    a trailing "*" for a prefix search, becomes a lookup on the indexed tokens
+    field when use_tokens is set. Callers must copy the filter before
+    changing it.
+    """
+    words = query.lower().split()
+    if words and not tokenize(query):
+        return None, None
+    word = words[0].rstrip("*") if len(words) == 1 else None
+    prefix = word is not None and word != words[0]
+    # tokens saved before they were unicode aware only hold ascii words
+    if word and word.isascii() and tokenize(word) == [word]:
+        if prefix:
+            raw_pattern = r"(\b|[\.\+\-_])" + re.escape(word)
+            tokens = {"$gte": word, "$lt": word + "\uffff"}
+        else:
+            raw_pattern = r"(\b|[\.\+\-_])" + word + r"(\b|[\.\+\-_])"
+            tokens = word
         regex = re.compile(raw_pattern, flags=re.IGNORECASE)
-    except:
-        regex = query
-    filter = {"file_name": regex}
-    cursor = Media.find(filter)
-    cursor.sort("$natural", -1)
+        if use_tokens:
+            return regex, {"tokens": tokens}
+        return regex, {"file_name": regex}
+    if not words:
+        raw_pattern = "."
+    elif len(words) == 1:
+        raw_pattern = r"(\b|[\.\+\-_])" + re.escape(words[0]) + r"(\b|[\.\+\-_])"
+    else:
+        raw_pattern = r".*[\s\.\+\-_]".join(map(re.escape, words))
+    regex = re.compile(raw_pattern, flags=re.IGNORECASE)
+    return regex, {"file_name": regex}
+
+
+def get_search_filter(query, lang=None, facets=None):
+    """Mongo filter for a search, None when the query cannot match anything"""
+    regex, filter = get_query_filter(query, FIELDS_READY)
+    if filter is None:
+        return None
+    conditions = get_facet_filter(facets) if facets else []
     if lang:
-        lang_files = [file async for file in cursor if lang in file.file_name.lower()]
-        files = lang_files[offset:][:max_results]
-        total_results = len(lang_files)
-        next_offset = offset + max_results
-        if next_offset >= total_results:
-            next_offset = ""
-        return files, next_offset, total_results
-    cursor.skip(offset).limit(max_results)
-    files = await cursor.to_list(length=max_results)
-    total_results = await Media.count_documents(filter)
+        lang_regex = re.compile(re.escape(lang.lower()), flags=re.IGNORECASE)
+        conditions.append({"file_name": lang_regex})
+    if conditions:
+        filter = {"$and": [filter, *conditions]}
+    return filter
+
+
+async def search_files(
+    query, max_results=MAX_BTN, offset=0, lang=None, facets=None, session=None
+):
+    if SEARCH_BACKEND == "index" and search_index.ready and query and not facets:
+        return await get_index_results(query, max_results, offset, lang)
+    filter = get_search_filter(query, lang, facets)
+    if filter is None:
+        return [], "", 0
+    facet_key = tuple(sorted((facets or {}).items()))
+    page_key = (session, query.lower(), lang, facet_key, max_results)
+    after = get_page_cursor(page_key, offset)
+    if SINGLE_PASS_SEARCH:
+        files, total_results = await get_facet_results(
+            filter, max_results, offset, after
+        )
+    else:
+        if after:
+            cursor = Media.find({"$and": [filter, after_cursor(after)]})
+        else:
+            cursor = Media.find(filter)
+        if FIELDS_READY:
+            cursor.sort([("seq", -1), ("_id", -1)])
+        else:
+            cursor.sort("$natural", -1)
+        if not after:
+            cursor.skip(offset)
+        cursor.limit(max_results)
+        files = await cursor.to_list(length=max_results)
+        total_results = await Media.count_documents(filter)
+    if files:
+        save_page_cursor(page_key, offset + max_results, files[-1])
     next_offset = offset + max_results
     if next_offset >= total_results:
         next_offset = ""
     return files, next_offset, total_results
 
 
-async def get_bad_files(query, file_type=None, offset=0, filter=False):
+def count_group(field):
+    return [
+        {"$unwind": f"${field}"},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+    ]
+
+
+async def get_facet_counts(query, lang=None, facets=None):
+    """Matches per quality, language, season and year for a search.
+
+    Once the fields are backfilled every matching file is counted, grouping
+    only reads a few small fields with few distinct values. Before that the
+    fields are taken from the file names of at most SEARCH_COUNT_LIMIT
+    matches, and None is returned when there are more, since partial counts
+    would hide options that do have results. Cached with the search pages.
+    """
     query = query.strip()
-    if not query:
-        raw_pattern = "."
-    elif " " not in query:
-        raw_pattern = r"(\b|[\.\+\-_])" + query + r"(\b|[\.\+\-_])"
+    facets = facets or {}
+    key = (
+        " ".join(query.lower().split()),
+        "counts",
+        lang,
+        tuple(sorted(facets.items())),
+    )
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached[1]
+    counts = {field: {} for field in ("quality", "languages", "season", "year")}
+    filter = get_search_filter(query, lang, facets)
+    if filter is None:
+        return counts
+    if FIELDS_READY:
+        pipeline = [
+            {"$match": filter},
+            {"$facet": {field: count_group(field) for field in counts}},
+        ]
+        result = (await Media.collection.aggregate(pipeline).to_list(length=1))[0]
+        for field, groups in result.items():
+            counts[field] = {g["_id"]: g["count"] for g in groups if g["_id"]}
     else:
-        raw_pattern = query.replace(" ", r".*[\s\.\+\-_]")
-    try:
-        regex = re.compile(raw_pattern, flags=re.IGNORECASE)
-    except:
-        return []
-    filter = {"file_name": regex}
+        pipeline = [
+            {"$match": filter},
+            {"$limit": SEARCH_COUNT_LIMIT + 1},
+            {"$project": {"file_name": 1}},
+        ]
+        docs = await Media.collection.aggregate(pipeline).to_list(length=None)
+        if len(docs) > SEARCH_COUNT_LIMIT:
+            docs, counts = [], None
+        for doc in docs:
+            values = extract_media_fields(doc.get("file_name", ""))
+            for field in counts:
+                value = values[field]
+                for item in value if isinstance(value, list) else [value]:
+                    if item:
+                        counts[field][item] = counts[field].get(item, 0) + 1
+    search_cache.set(key, (tokenize(query), counts))
+    return counts
+
+
+async def get_bad_files(query, file_type=None, offset=0, filter=False):
+    regex, filter = get_query_filter(query.strip(), FIELDS_READY)
+    if filter is None:
+        return [], 0
     if file_type:
-        filter["file_type"] = file_type
+        filter = dict(filter, file_type=file_type)
     total_results = await Media.count_documents(filter)
     cursor = Media.find(filter)
     cursor.sort("$natural", -1)
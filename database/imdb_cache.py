@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from info import DATABASE_URI, DATABASE_NAME
+
+
+class ImdbCache:
+    """Second tier of the get_poster cache, shared by restarts and workers.
+    A value of None records that IMDb had no result."""
+
+    def __init__(self, uri, db_name):
+        self.client = AsyncIOMotorClient(uri)
+        self.col = self.client[db_name].imdb_cache
+
+    async def ensure_indexes(self):
+        await self.col.create_index("expires", expireAfterSeconds=0)
+
+    async def get(self, key):
+        """(found, value) for key"""
+        doc = await self.col.find_one(
+            {"_id": key, "expires": {"$gt": datetime.utcnow()}}
+        )
+        if doc is None:
+            return False, None
+        return True, doc["value"]
+
+    async def set(self, key, value, ttl):
+        expires = datetime.utcnow() + timedelta(seconds=ttl)
+        await self.col.update_one(
+            {"_id": key}, {"$set": {"value": value, "expires": expires}}, upsert=True
+        )
+
+
+imdb_cache = ImdbCache(DATABASE_URI, DATABASE_NAME)
@@ -15,8 +15,9 @@ class UserTracker:
         self.refer_collection = mydb["refers"]
 
     def add_user(self, user_id):
-        if not self.is_user_in_list(user_id):
-            self.user_collection.insert_one({"user_id": user_id})
+        self.user_collection.update_one(
+            {"user_id": user_id}, {"$setOnInsert": {"user_id": user_id}}, upsert=True
+        )
 
     def remove_user(self, user_id):
         self.user_collection.delete_one({"user_id": user_id})
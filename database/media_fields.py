@@ -0,0 +1,92 @@
+import re
+from info import QUALITIES, LANGUAGES
+from database.search_index import tokenize
+
+YEAR_RE = re.compile(r"^(19\d{2}|20\d{2})$")
+SEASON_EPISODE_RE = re.compile(r"^s(\d{1,2})e(\d{1,3})$")
+SEASON_RE = re.compile(r"^s(\d{1,2})$")
+EPISODE_RE = re.compile(r"^(?:e|ep)(\d{1,3})$")
+CODECS = ["x265", "x264", "hevc", "h265", "h264", "avc", "av1", "xvid"]
+RELEASE_TAGS = set(
+    "web webrip hdtv dvdrip brrip bdrip hdcam camrip predvd dual multi audio org "
+    "esub esubs uncut mkv mp4 avi 10bit aac dd5 hq".split()
+)
+
+
+def quality_key(quality):
+    """web-dl, Web DL and WEBDL all map to webdl"""
+    return re.sub(r"[^a-z0-9]", "", quality.lower())
+
+
+QUALITY_KEYS = {quality_key(q) for q in QUALITIES}
+LANGUAGE_KEYS = {lang: {lang, lang[:3]} for lang in LANGUAGES}
+
+
+def extract_media_fields(file_name):
+    """Normalized search fields for a Media document, extracted once at save time"""
+    tokens = tokenize(file_name)
+    year = season = episode = codec = None
+    for i, token in enumerate(tokens):
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if year is None and YEAR_RE.match(token):
+            year = int(token)
+        elif season is None and SEASON_EPISODE_RE.match(token):
+            season, episode = map(int, SEASON_EPISODE_RE.match(token).groups())
+        elif season is None and SEASON_RE.match(token):
+            season = int(SEASON_RE.match(token).group(1))
+        elif season is None and token == "season" and nxt.isdigit():
+            season = int(nxt)
+        elif episode is None and EPISODE_RE.match(token):
+            episode = int(EPISODE_RE.match(token).group(1))
+        elif episode is None and token == "episode" and nxt.isdigit():
+            episode = int(nxt)
+        elif codec is None and token in CODECS:
+            codec = token
+    token_set = set(tokens)
+    pairs = {a + b for a, b in zip(tokens, tokens[1:])}
+    quality = sorted(QUALITY_KEYS & (token_set | pairs))
+    languages = [lang for lang, keys in LANGUAGE_KEYS.items() if keys & token_set]
+    return {
+        "tokens": sorted(token_set),
+        "year": year,
+        "season": season,
+        "episode": episode,
+        "quality": quality,
+        "languages": languages,
+        "codec": codec,
+    }
+
+
+def extract_title(file_name):
+    """Leading words of a file name, up to the first year/season/quality tag"""
+    title = []
+    for token in tokenize(file_name):
+        if title and (
+            YEAR_RE.match(token)
+            or SEASON_EPISODE_RE.match(token)
+            or SEASON_RE.match(token)
+            or EPISODE_RE.match(token)
+            or token in ("season", "episode")
+            or token in QUALITY_KEYS
+            or token in CODECS
+            or token in LANGUAGE_KEYS
+            or token in RELEASE_TAGS
+        ):
+            break
+        title.append(token)
+    return " ".join(title)
+
+
+def facet_regex(field, value):
+    """file_name regex for a facet, used until the fields are backfilled"""
+    if field == "season":
+        pattern = rf"\bs0?{value}(\b|e\d)|season\s?0?{value}\b"
+    elif field == "year":
+        pattern = rf"\b{value}\b"
+    elif field == "quality":
+        pattern = r"\s?".join(re.escape(c) for c in quality_key(value))
+    elif field == "languages":
+        pattern = f"{re.escape(value)}|{re.escape(value[:3])}"
+    else:
+        pattern = re.escape(str(value))
+    return re.compile(pattern, flags=re.IGNORECASE)
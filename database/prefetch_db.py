@@ -0,0 +1,35 @@
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from info import DATABASE_URI, DATABASE_NAME
+
+
+class PrefetchQueue:
+    """Titles waiting for their IMDb details to be fetched ahead of time.
+    Kept in Mongo so the queue survives restarts."""
+
+    def __init__(self, uri, db_name):
+        self.client = AsyncIOMotorClient(uri)
+        self.col = self.client[db_name].imdb_prefetch
+
+    async def ensure_indexes(self):
+        await self.col.create_index("added")
+
+    async def add(self, title, file=None):
+        title = " ".join(title.lower().split())
+        if not title or len(title) > 64:
+            return
+        await self.col.update_one(
+            {"_id": title},
+            {"$setOnInsert": {"file": file, "added": datetime.utcnow()}},
+            upsert=True,
+        )
+
+    async def next_batch(self, limit=10):
+        cursor = self.col.find().sort("added", 1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def done(self, title):
+        await self.col.delete_one({"_id": title})
+
+
+prefetch_queue = PrefetchQueue(DATABASE_URI, DATABASE_NAME)
@@ -0,0 +1,48 @@
+from info import RANK_QUALITIES
+from database.search_index import tokenize
+from database.media_fields import extract_title, quality_key
+
+MIN_VIDEO_SIZE = 30 * 1024 * 1024
+QUALITY_RANK = {
+    quality_key(q): 1 - i / len(RANK_QUALITIES) for i, q in enumerate(RANK_QUALITIES)
+}
+
+
+def has_phrase(words, tokens):
+    """True if the query words appear next to each other, in order"""
+    n = len(words)
+    return any(tokens[i : i + n] == words for i in range(len(tokens) - n + 1))
+
+
+def score_file(words, phrase, file):
+    tokens = tokenize(file.file_name)
+    token_set = set(tokens)
+    exact = sum(word in token_set for word in words)
+    partial = sum(
+        word not in token_set and any(t.startswith(word) for t in tokens)
+        for word in words
+    )
+    score = 4 * (exact + partial / 2) / len(words)
+    if len(words) > 1 and has_phrase(words, tokens):
+        score += 2
+    title = extract_title(file.file_name)
+    if title == phrase:
+        score += 3
+    elif title.startswith(phrase):
+        score += 1.5
+    qualities = file.quality or [q for q in QUALITY_RANK if q in token_set]
+    score += max((QUALITY_RANK.get(q, 0) for q in qualities), default=0)
+    if file.file_type == "video" and (file.file_size or 0) < MIN_VIDEO_SIZE:
+        score -= 2
+    return score
+
+
+def rank_files(query, files):
+    """Sort files by relevance to query, ties keep their newest first order"""
+    words = tokenize(query)
+    if not words or len(files) < 2:
+        return files
+    phrase = " ".join(words)
+    scores = [score_file(words, phrase, file) for file in files]
+    order = sorted(range(len(files)), key=lambda i: -scores[i])
+    return [files[i] for i in order]
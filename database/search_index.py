@@ -0,0 +1,144 @@
+import re
+import unicodedata
+from collections import Counter
+
+# letters, digits and combining marks (the vowel signs of Indic scripts are
+# marks, not \w) of any script, "_" separates words like "." and "-" do
+MARKS = "".join(
+    c for c in map(chr, range(0x300, 0x10000)) if unicodedata.category(c)[0] == "M"
+)
+TOKEN_RE = re.compile(f"(?:[^\\W_]|[{re.escape(MARKS)}])+")
+
+
+def tokenize(text):
+    """Split a file name or query into casefolded word tokens"""
+    return TOKEN_RE.findall(str(text).casefold())
+
+
+class TokenIndex:
+    """In-memory inverted index of file_name tokens -> Media ids.
+
+    Posting lists are plain sets, so a multi word query is answered by
+    intersecting the postings of its tokens, smallest first. Every id also
+    keeps an insertion sequence number which is used to return the newest
+    files first, the same order as the `$natural` sorted Mongo search.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.tokens = {}
+        self.order = {}
+        self.seq = 0
+        self.ready = False
+
+    def __len__(self):
+        return len(self.order)
+
+    def add(self, file_id, file_name):
+        if file_id in self.order:
+            self.remove(file_id)
+        self.seq += 1
+        self.order[file_id] = self.seq
+        tokens = tuple(set(tokenize(file_name)))
+        self.tokens[file_id] = tokens
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(file_id)
+
+    def remove(self, file_id):
+        tokens = self.tokens.pop(file_id, None)
+        if tokens is None:
+            return
+        del self.order[file_id]
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(file_id)
+            if not ids:
+                del self.postings[token]
+
+    def clear(self):
+        self.postings.clear()
+        self.tokens.clear()
+        self.order.clear()
+        self.seq = 0
+
+    def search(self, query):
+        """Return ids matching every token of query, newest first"""
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        postings = sorted((self.postings.get(t, set()) for t in tokens), key=len)
+        if not postings[0]:
+            return []
+        ids = postings[0].intersection(*postings[1:])
+        return sorted(ids, key=self.order.__getitem__, reverse=True)
+
+
+def trigrams(text):
+    text = f" {' '.join(tokenize(text))} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """In-memory trigram index over distinct titles, for "did you mean".
+
+    Titles are reference counted so the index can follow saves and deletes
+    of the individual files they were extracted from.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.titles = {}
+        self.ready = False
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, title):
+        if not title:
+            return
+        if title in self.titles:
+            self.titles[title][0] += 1
+            return
+        grams = trigrams(title)
+        self.titles[title] = [1, len(grams)]
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(title)
+
+    def remove(self, title):
+        entry = self.titles.get(title)
+        if entry is None:
+            return
+        entry[0] -= 1
+        if entry[0] > 0:
+            return
+        del self.titles[title]
+        for gram in trigrams(title):
+            titles = self.postings.get(gram)
+            if titles is None:
+                continue
+            titles.discard(title)
+            if not titles:
+                del self.postings[gram]
+
+    def clear(self):
+        self.postings.clear()
+        self.titles.clear()
+
+    def suggest(self, query, limit=5, min_score=0.4):
+        """Closest titles to query as (title, score), score is the Dice
+        coefficient of the trigram sets"""
+        grams = trigrams(query)
+        if len(grams) < 2:
+            return []
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for title, count in shared.items():
+            score = 2 * count / (len(grams) + self.titles[title][1])
+            if score >= min_score:
+                scored.append((title, round(score, 3)))
+        scored.sort(key=lambda item: (-item[1], -self.titles[item[0]][0]))
+        return scored[:limit]
@@ -0,0 +1,150 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from info import (
+    DATABASE_URI,
+    DATABASE_NAME,
+    SESSION_BACKEND,
+    REDIS_URL,
+    SESSION_TTL,
+    SESSION_MAX_ITEMS,
+    SESSION_MAX_BYTES,
+)
+from Jisshu.util.cache import CACHES
+
+# Per search/message state lives in namespaces of one store:
+#   query   - "<chat>-<msg>" -> search text
+#   cap     - "<chat>-<msg>" -> result caption
+#   filters - "<chat>-<msg>" -> active season/year/quality/language facets
+#   files   - "<chat>-<msg>" -> file ids of the current page
+#   chat    - user id -> group the user last searched in
+# Values must be JSON serializable so every backend can hold them.
+
+
+class MemoryStore:
+    """LRU store bounded by item count, approximate bytes and TTL"""
+
+    def __init__(self, ttl, max_items, max_bytes):
+        self.name = "sessions"
+        self.ttl = ttl
+        self.maxsize = max_items
+        self.max_bytes = max_bytes
+        self.data = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        CACHES[self.name] = self
+
+    def __len__(self):
+        return len(self.data)
+
+    async def ensure_indexes(self):
+        pass
+
+    def drop(self, key):
+        _, _, size = self.data.pop(key)
+        self.bytes -= size
+
+    async def get(self, ns, key, default=None):
+        key = f"{ns}:{key}"
+        item = self.data.get(key)
+        if item is None or item[1] < time.monotonic():
+            if item is not None:
+                self.drop(key)
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    async def set(self, ns, key, value):
+        key = f"{ns}:{key}"
+        if key in self.data:
+            self.drop(key)
+        size = len(key) + len(json.dumps(value, ensure_ascii=False))
+        self.data[key] = (value, time.monotonic() + self.ttl, size)
+        self.bytes += size
+        while self.data and (
+            len(self.data) > self.maxsize or self.bytes > self.max_bytes
+        ):
+            self.drop(next(iter(self.data)))
+
+    async def pop(self, ns, key):
+        key = f"{ns}:{key}"
+        if key in self.data:
+            self.drop(key)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits * 100 / total, 2) if total else 0,
+            "bytes": self.bytes,
+        }
+
+
+class RedisStore:
+    """Same interface on Redis, so state survives restarts and is shared"""
+
+    def __init__(self, url, ttl):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+
+    async def ensure_indexes(self):
+        pass
+
+    async def get(self, ns, key, default=None):
+        value = await self.redis.get(f"jisshu:{ns}:{key}")
+        return default if value is None else json.loads(value)
+
+    async def set(self, ns, key, value):
+        await self.redis.set(f"jisshu:{ns}:{key}", json.dumps(value), ex=self.ttl)
+
+    async def pop(self, ns, key):
+        await self.redis.delete(f"jisshu:{ns}:{key}")
+
+
+class MongoStore:
+    """Same interface on the main database, expired entries are removed by a
+    TTL index"""
+
+    def __init__(self, uri, db_name, ttl):
+        self.col = AsyncIOMotorClient(uri)[db_name].sessions
+        self.ttl = ttl
+
+    async def ensure_indexes(self):
+        await self.col.create_index("expires", expireAfterSeconds=0)
+
+    async def get(self, ns, key, default=None):
+        doc = await self.col.find_one(
+            {"_id": f"{ns}:{key}", "expires": {"$gt": datetime.utcnow()}}
+        )
+        return default if doc is None else doc["value"]
+
+    async def set(self, ns, key, value):
+        expires = datetime.utcnow() + timedelta(seconds=self.ttl)
+        await self.col.update_one(
+            {"_id": f"{ns}:{key}"},
+            {"$set": {"value": value, "expires": expires}},
+            upsert=True,
+        )
+
+    async def pop(self, ns, key):
+        await self.col.delete_one({"_id": f"{ns}:{key}"})
+
+
+def get_store():
+    if SESSION_BACKEND == "redis" and REDIS_URL:
+        return RedisStore(REDIS_URL, SESSION_TTL)
+    if SESSION_BACKEND == "mongo":
+        return MongoStore(DATABASE_URI, DATABASE_NAME, SESSION_TTL)
+    return MemoryStore(SESSION_TTL, SESSION_MAX_ITEMS, SESSION_MAX_BYTES)
+
+
+sessions = get_store()
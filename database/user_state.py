@@ -0,0 +1,128 @@
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
+from info import DATABASE_URI, DATABASE_NAME
+
+# state key -> (collection, field holding the user id), one document per user
+SOURCES = {
+    "user": ("users", "id"),
+    "premium": ("uersz", "id"),
+    "misc": ("misc", "user_id"),
+    "join_req": ("requests", "id"),
+    "referred": ("referusers", "user_id"),
+    "refer": ("refers", "user_id"),
+}
+
+
+def lookup_stages(local_field):
+    stages = [
+        {
+            "$lookup": {
+                "from": col,
+                "localField": local_field,
+                "foreignField": field,
+                "as": key,
+            }
+        }
+        for key, (col, field) in SOURCES.items()
+    ]
+    # pending verification links, verified ones are never read again
+    stages.append(
+        {
+            "$lookup": {
+                "from": "verify_id",
+                "localField": local_field,
+                "foreignField": "user_id",
+                "pipeline": [
+                    {"$match": {"verified": False}},
+                    {"$project": {"_id": 0, "hash": 1}},
+                ],
+                "as": "verify_ids",
+            }
+        }
+    )
+    return stages
+
+
+class UserState:
+    """Everything stored about a user, spread over several collections, read
+    with one aggregation"""
+
+    def __init__(self, uri, db_name):
+        self.client = AsyncIOMotorClient(uri)
+        self.db = self.client[db_name]
+
+    async def ensure_index(self, col, field, unique=False):
+        """Index field, replacing a non-unique one if unique is asked for"""
+        col = self.db[col]
+        for name, index in (await col.index_information()).items():
+            if index["key"] == [(field, 1)]:
+                if index.get("unique") or not unique:
+                    return
+                await col.drop_index(name)
+        await col.create_index(field, unique=unique)
+
+    async def ensure_indexes(self):
+        for col, field in SOURCES.values():
+            await self.ensure_index(col, field)
+        await self.ensure_index("uersz", "expiry_time")
+        await self.db.verify_id.create_index([("user_id", 1), ("hash", 1)])
+
+    async def get(self, user_id):
+        """{state key: document or None, "verify_ids": [hash, ...]} of a user.
+
+        Needs MongoDB 5.1+ for $documents, older servers get the same reads
+        run concurrently.
+        """
+        user_id = int(user_id)
+        pipeline = [{"$documents": [{"user_id": user_id}]}] + lookup_stages("user_id")
+        try:
+            docs = await self.db.aggregate(pipeline).to_list(length=1)
+        except OperationFailure:
+            return await self.get_each(user_id)
+        state = {key: (docs[0][key] or [None])[0] for key in SOURCES}
+        state["verify_ids"] = [doc["hash"] for doc in docs[0]["verify_ids"]]
+        return state
+
+    async def get_each(self, user_id):
+        found = await asyncio.gather(
+            *(
+                self.db[col].find_one({field: user_id})
+                for col, field in SOURCES.values()
+            )
+        )
+        state = dict(zip(SOURCES, found))
+        cursor = self.db.verify_id.find({"user_id": user_id, "verified": False})
+        state["verify_ids"] = [doc["hash"] async for doc in cursor]
+        return state
+
+    async def dedupe(self, col, field):
+        """Keep the first stored document of every user, the one reads used"""
+        removed = 0
+        duplicates = self.db[col].aggregate(
+            [
+                {"$match": {field: {"$ne": None}}},
+                {"$sort": {"_id": 1}},
+                {"$group": {"_id": f"${field}", "ids": {"$push": "$_id"}}},
+                {"$match": {"ids.1": {"$exists": True}}},
+            ],
+            allowDiskUse=True,
+        )
+        async for group in duplicates:
+            result = await self.db[col].delete_many({"_id": {"$in": group["ids"][1:]}})
+            removed += result.deleted_count
+        return removed
+
+    async def migrate(self):
+        """One-off upgrade of an existing database: drop duplicate per-user
+        documents and make the user id indexes unique. Returns the removed
+        duplicates per collection."""
+        removed = {}
+        for col, field in SOURCES.values():
+            removed[col] = await self.dedupe(col, field)
+            await self.ensure_index(col, field, unique=True)
+        await self.ensure_indexes()
+        return removed
+
+
+user_state = UserState(DATABASE_URI, DATABASE_NAME)
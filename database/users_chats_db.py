@@ -1,6 +1,7 @@
 import datetime
 import pytz
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 
 # from info import SETTINGS, IS_PM_SEARCH, IS_SEND_MOVIE_UPDATE, PREMIUM_POINT,REF_PREMIUM,IS_VERIFY, SHORTENER_WEBSITE3, SHORTENER_API3, THREE_VERIFY_GAP, LINK_MODE, FILE_CAPTION, TUTORIAL, DATABASE_NAME, DATABASE_URI, IMDB, IMDB_TEMPLATE, PROTECT_CONTENT, AUTO_DELETE, SPELL_CHECK, AUTO_FILTER, LOG_VR_CHANNEL, SHORTENER_WEBSITE, SHORTENER_API, SHORTENER_WEBSITE2, SHORTENER_API2, TWO_VERIFY_GAP
 # from utils import get_seconds
@@ -9,6 +10,33 @@ from info import *
 client = AsyncIOMotorClient(DATABASE_URI)
 mydb = client[DATABASE_NAME]
 
+IST = pytz.timezone("Asia/Kolkata")
+# verification times of a user who never verified
+NOT_VERIFIED = {
+    "last_verified": datetime.datetime(2020, 5, 17, 0, 0, 0, tzinfo=IST),
+    "second_time_verified": datetime.datetime(2019, 5, 17, 0, 0, 0, tzinfo=IST),
+    "third_time_verified": datetime.datetime(2018, 5, 17, 0, 0, 0, tzinfo=IST),
+}
+
+
+def verified_today(past_date):
+    current_time = datetime.datetime.now(tz=IST)
+    midnight = datetime.datetime(
+        current_time.year, current_time.month, current_time.day, 0, 0, 0, tzinfo=IST
+    )
+    return current_time - past_date.astimezone(IST) <= current_time - midnight
+
+
+def needs_shortener(misc, verified, next_verified, gap):
+    """True when the `verified` step was done today, more than gap seconds ago,
+    and the `next_verified` step has not been done since"""
+    if not verified_today(misc[verified]):
+        return False
+    past_date = misc[verified].astimezone(IST)
+    if datetime.datetime.now(tz=IST) - past_date > datetime.timedelta(seconds=gap):
+        return misc[next_verified].astimezone(IST) < past_date
+    return False
+
 
 class Database:
     def __init__(self):
@@ -55,17 +83,15 @@ class Database:
         )
 
     async def get_settings(self, group_id):
-        chat = await self.grp.find_one({"id": int(group_id)})
-        if chat and "settings" in chat:
-            return chat["settings"]
-        else:
-            return self.default.copy()
+        """Stored settings over the current defaults"""
+        chat = await self.grp.find_one({"id": int(group_id)}, {"settings": 1})
+        return dict(self.default, **((chat or {}).get("settings") or {}))
 
     async def find_join_req(self, id):
         return bool(await self.req.find_one({"id": id}))
 
     async def add_join_req(self, id):
-        await self.req.insert_one({"id": id})
+        await self.req.update_one({"id": id}, {"$set": {"id": id}}, upsert=True)
 
     async def del_join_req(self):
         await self.req.drop()
@@ -75,7 +101,7 @@ class Database:
 
     async def add_user(self, id, name):
         user = self.new_user(id, name)
-        await self.col.insert_one(user)
+        await self.col.update_one({"id": id}, {"$setOnInsert": user}, upsert=True)
 
     async def update_point(self, id):
         await self.col.update_one({"id": id}, {"$inc": {"point": 100}})
@@ -130,7 +156,11 @@ class Database:
         return False if not chat else chat.get("chat_status")
 
     async def update_settings(self, id, settings):
-        await self.grp.update_one({"id": int(id)}, {"$set": {"settings": settings}})
+        """Set only the given keys, in one update"""
+        await self.grp.update_one(
+            {"id": int(id)},
+            {"$set": {f"settings.{key}": value for key, value in settings.items()}},
+        )
 
     async def total_chat_count(self):
         count = await self.grp.count_documents({})
@@ -145,18 +175,13 @@ class Database:
     async def get_notcopy_user(self, user_id):
         user_id = int(user_id)
         user = await self.misc.find_one({"user_id": user_id})
-        ist_timezone = pytz.timezone("Asia/Kolkata")
         if not user:
-            res = {
-                "user_id": user_id,
-                "last_verified": datetime.datetime(
-                    2020, 5, 17, 0, 0, 0, tzinfo=ist_timezone
-                ),
-                "second_time_verified": datetime.datetime(
-                    2019, 5, 17, 0, 0, 0, tzinfo=ist_timezone
-                ),
-            }
-            user = await self.misc.insert_one(res)
+            user = await self.misc.find_one_and_update(
+                {"user_id": user_id},
+                {"$setOnInsert": dict(NOT_VERIFIED, user_id=user_id)},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
         return user
 
     async def update_notcopy_user(self, user_id, value: dict):
@@ -165,116 +190,6 @@ class Database:
         newvalues = {"$set": value}
         return await self.misc.update_one(myquery, newvalues)
 
-    async def is_user_verified(self, user_id):
-        user = await self.get_notcopy_user(user_id)
-        try:
-            pastDate = user["last_verified"]
-        except Exception:
-            user = await self.get_notcopy_user(user_id)
-            pastDate = user["last_verified"]
-        ist_timezone = pytz.timezone("Asia/Kolkata")
-        pastDate = pastDate.astimezone(ist_timezone)
-        current_time = datetime.datetime.now(tz=ist_timezone)
-        seconds_since_midnight = (
-            current_time
-            - datetime.datetime(
-                current_time.year,
-                current_time.month,
-                current_time.day,
-                0,
-                0,
-                0,
-                tzinfo=ist_timezone,
-            )
-        ).total_seconds()
-        time_diff = current_time - pastDate
-        total_seconds = time_diff.total_seconds()
-        return total_seconds <= seconds_since_midnight
-
-    async def user_verified(self, user_id):
-        user = await self.get_notcopy_user(user_id)
-        try:
-            pastDate = user["second_time_verified"]
-        except Exception:
-            user = await self.get_notcopy_user(user_id)
-            pastDate = user["second_time_verified"]
-        ist_timezone = pytz.timezone("Asia/Kolkata")
-        pastDate = pastDate.astimezone(ist_timezone)
-        current_time = datetime.datetime.now(tz=ist_timezone)
-        seconds_since_midnight = (
-            current_time
-            - datetime.datetime(
-                current_time.year,
-                current_time.month,
-                current_time.day,
-                0,
-                0,
-                0,
-                tzinfo=ist_timezone,
-            )
-        ).total_seconds()
-        time_diff = current_time - pastDate
-        total_seconds = time_diff.total_seconds()
-        return total_seconds <= seconds_since_midnight
-
-    async def use_second_shortener(self, user_id, time):
-        user = await self.get_notcopy_user(user_id)
-        if not user.get("second_time_verified"):
-            ist_timezone = pytz.timezone("Asia/Kolkata")
-            await self.update_notcopy_user(
-                user_id,
-                {
-                    "second_time_verified": datetime.datetime(
-                        2019, 5, 17, 0, 0, 0, tzinfo=ist_timezone
-                    )
-                },
-            )
-            user = await self.get_notcopy_user(user_id)
-        if await self.is_user_verified(user_id):
-            try:
-                pastDate = user["last_verified"]
-            except Exception:
-                user = await self.get_notcopy_user(user_id)
-                pastDate = user["last_verified"]
-            ist_timezone = pytz.timezone("Asia/Kolkata")
-            pastDate = pastDate.astimezone(ist_timezone)
-            current_time = datetime.datetime.now(tz=ist_timezone)
-            time_difference = current_time - pastDate
-            if time_difference > datetime.timedelta(seconds=time):
-                pastDate = user["last_verified"].astimezone(ist_timezone)
-                second_time = user["second_time_verified"].astimezone(ist_timezone)
-                return second_time < pastDate
-        return False
-
-    async def use_third_shortener(self, user_id, time):
-        user = await self.get_notcopy_user(user_id)
-        if not user.get("third_time_verified"):
-            ist_timezone = pytz.timezone("Asia/Kolkata")
-            await self.update_notcopy_user(
-                user_id,
-                {
-                    "third_time_verified": datetime.datetime(
-                        2018, 5, 17, 0, 0, 0, tzinfo=ist_timezone
-                    )
-                },
-            )
-            user = await self.get_notcopy_user(user_id)
-        if await self.user_verified(user_id):
-            try:
-                pastDate = user["second_time_verified"]
-            except Exception:
-                user = await self.get_notcopy_user(user_id)
-                pastDate = user["second_time_verified"]
-            ist_timezone = pytz.timezone("Asia/Kolkata")
-            pastDate = pastDate.astimezone(ist_timezone)
-            current_time = datetime.datetime.now(tz=ist_timezone)
-            time_difference = current_time - pastDate
-            if time_difference > datetime.timedelta(seconds=time):
-                pastDate = user["second_time_verified"].astimezone(ist_timezone)
-                second_time = user["third_time_verified"].astimezone(ist_timezone)
-                return second_time < pastDate
-        return False
-
     async def create_verify_id(self, user_id: int, hash):
         res = {"user_id": user_id, "hash": hash, "verified": False}
         return await self.verify_id.insert_one(res)
@@ -319,7 +234,10 @@ class Database:
         return expired_users
 
     async def has_premium_access(self, user_id):
-        user_data = await self.get_user(user_id)
+        return await self.check_premium(await self.get_user(user_id))
+
+    async def check_premium(self, user_data):
+        """Whether a premium document is still active, clearing it once expired"""
         if user_data:
             expiry_time = user_data.get("expiry_time")
             if expiry_time is None:
@@ -332,7 +250,7 @@ class Database:
                 return True
             else:
                 await self.users.update_one(
-                    {"id": user_id}, {"$set": {"expiry_time": None}}
+                    {"id": user_data["id"]}, {"$set": {"expiry_time": None}}
                 )
         return False
 
@@ -461,7 +379,7 @@ class Database:
         )
 
     async def reset_group_settings(self, id):
-        await self.grp.update_one({"id": int(id)}, {"$set": {"settings": self.default}})
+        await self.grp.update_one({"id": int(id)}, {"$unset": {"settings": ""}})
 
 
 db = Database()
@@ -163,6 +163,84 @@ SPELL_CHECK = is_enabled("SPELL_CHECK", True)
 LINK_MODE = is_enabled("LINK_MODE", True)
 TMDB_API_KEY = environ.get("TMDB_API_KEY", "")
 
+# Search
+SEARCH_BACKEND = environ.get(
+    "SEARCH_BACKEND", "mongo"
+).lower()  # mongo or index (in-memory token index, built on startup)
+SINGLE_PASS_SEARCH = is_enabled(
+    environ.get("SINGLE_PASS_SEARCH", "True"), True
+)  # page + total count from one $facet aggregation
+SEARCH_COUNT_LIMIT = int(
+    environ.get("SEARCH_COUNT_LIMIT", "1000")
+)  # stop counting matches after this many ("1000+")
+SEARCH_CACHE_SIZE = int(environ.get("SEARCH_CACHE_SIZE", "2000"))  # cached pages
+SEARCH_CACHE_TTL = int(environ.get("SEARCH_CACHE_TTL", "300"))  # seconds
+RANK_RESULTS = is_enabled(
+    environ.get("RANK_RESULTS", "True"), True
+)  # order the first RANK_WINDOW matches by relevance instead of upload time
+RANK_WINDOW = int(environ.get("RANK_WINDOW", "100"))
+RANK_QUALITIES = environ.get(
+    "RANK_QUALITIES", "1080p 720p 2160p web-dl bluray hdrip 480p"
+).split()  # preferred first
+SPELL_CHECK_SCORE = float(
+    environ.get("SPELL_CHECK_SCORE", "0.6")
+)  # min trigram similarity (0-1) for a "did you mean" title
+
+# Search Sessions (buttons, captions and file lists of sent results)
+SESSION_BACKEND = environ.get(
+    "SESSION_BACKEND", "memory"
+).lower()  # memory, mongo (DATABASE_URI) or redis (redis package + REDIS_URL)
+REDIS_URL = environ.get("REDIS_URL", "")
+SESSION_TTL = int(environ.get("SESSION_TTL", "43200"))  # 12 hours
+SESSION_MAX_ITEMS = int(environ.get("SESSION_MAX_ITEMS", "100000"))
+SESSION_MAX_BYTES = int(
+    environ.get("SESSION_MAX_BYTES", str(64 * 1024 * 1024))
+)  # memory backend only
+
+# Group Settings Cache
+SETTINGS_CACHE_SIZE = int(environ.get("SETTINGS_CACHE_SIZE", "5000"))  # groups
+SETTINGS_CACHE_TTL = int(environ.get("SETTINGS_CACHE_TTL", "600"))  # seconds
+SETTINGS_WATCH = is_enabled(
+    environ.get("SETTINGS_WATCH", "False"), False
+)  # follow a change stream so every process sees edits (needs a replica set)
+
+# Force Subscribe Membership Cache
+MEMBER_CACHE_SIZE = int(environ.get("MEMBER_CACHE_SIZE", "50000"))
+MEMBER_CACHE_TTL = int(environ.get("MEMBER_CACHE_TTL", "600"))  # member
+MEMBER_NEGATIVE_TTL = int(environ.get("MEMBER_NEGATIVE_TTL", "30"))  # not a member
+
+# Worker Mode (run WORKER_COUNT processes with launcher.py, chats are split
+# between them, use a mongo or redis SESSION_BACKEND so they share state)
+WORKER_ID = int(environ.get("WORKER_ID", "0"))
+WORKER_COUNT = int(environ.get("WORKER_COUNT", "1"))
+if WORKER_COUNT > 1:
+    # a new file reaches only the worker that saved it, the in-memory search
+    # index and result cache of the others would go stale
+    if SEARCH_BACKEND == "index":
+        raise SystemExit("SEARCH_BACKEND=index does not work with WORKER_COUNT > 1")
+    SEARCH_CACHE_SIZE = 0
+    # settings changed on one worker are only seen by the others through
+    # the change stream
+    if not SETTINGS_WATCH:
+        SETTINGS_CACHE_SIZE = 0
+
+# IMDb lookups (blocking, run in the shared thread pool)
+IMDB_CONCURRENCY = int(environ.get("IMDB_CONCURRENCY", "4"))
+IMDB_TIMEOUT = int(environ.get("IMDB_TIMEOUT", "10"))  # seconds
+IMDB_CACHE_SIZE = int(environ.get("IMDB_CACHE_SIZE", "2000"))  # in memory titles
+IMDB_CACHE_TTL = int(environ.get("IMDB_CACHE_TTL", str(7 * 86400)))
+IMDB_NEGATIVE_TTL = int(
+    environ.get("IMDB_NEGATIVE_TTL", "86400")
+)  # how long "not found" is remembered
+IMDB_PREFETCH = is_enabled(
+    environ.get("IMDB_PREFETCH", "True"), True
+)  # warm the cache for trending and newly added titles in the background
+PREFETCH_INTERVAL = int(environ.get("PREFETCH_INTERVAL", "5"))  # seconds per lookup
+
+# Executors (CPU heavy text work runs in processes, blocking calls in threads)
+CPU_WORKERS = int(environ.get("CPU_WORKERS", "2"))  # 0 runs CPU work in threads
+IO_WORKERS = int(environ.get("IO_WORKERS", "16"))
+
 # Online Streaming And Download
 STREAM_MODE = bool(environ.get("STREAM_MODE", True))  # Set True or Flase
 
@@ -191,6 +269,10 @@ admin_cmds = [
     "/clearlist - Clear Top Trending List",
     "/verify_id - Verification Off ID",
     "/index - Index Files",
+    "/backfill - Add Search Fields To Old Files",
+    "/migrate_users - Dedupe And Index User Data",
+    "/cachestats - Cache Hit Rates",
+    "/taskstats - Executor Task Timings",
     "/send - Send Message To A User",
     "/leave - Leave A Group Or Channel",
     "/ban - Ban A User",
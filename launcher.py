@@ -0,0 +1,36 @@
+import os
+import sys
+import signal
+import subprocess
+from info import WORKER_COUNT
+
+# Starts WORKER_COUNT copies of bot.py, each with its own WORKER_ID. Worker 0
+# also runs the web server and the background jobs.
+
+
+def main():
+    workers = []
+    for worker_id in range(WORKER_COUNT):
+        env = dict(os.environ, WORKER_ID=str(worker_id))
+        workers.append(subprocess.Popen([sys.executable, "bot.py"], env=env))
+        print(f"Started worker {worker_id} (pid {workers[-1].pid})")
+
+    def stop(*args):
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        # the first worker to exit takes the others down with it
+        pid, status = os.wait()
+        print(f"Worker pid {pid} exited with status {status}, stopping all")
+    except KeyboardInterrupt:
+        pass
+    stop()
+    for worker in workers:
+        worker.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,15 @@ from .route import routes
 from asyncio import sleep
 from datetime import datetime
 from database.users_chats_db import db
-from info import LOG_CHANNEL
+from database.config_db import mdb
+from database.topdb import JsTopDB
+from database.imdb_cache import imdb_cache
+from database.prefetch_db import prefetch_queue
+from database.ia_filterdb import get_search_results
+from utils import get_poster, imdb_cache_key
+from info import LOG_CHANNEL, DATABASE_URI, PREFETCH_INTERVAL
+
+movie_series_db = JsTopDB(DATABASE_URI)
 
 
 async def web_server():
@@ -32,3 +40,40 @@ async def check_expired_premium(client):
                 print(e)
             await sleep(0.5)
         await sleep(1)
+
+
+async def queue_trending_titles():
+    for title in await mdb.get_top_messages(30):
+        await prefetch_queue.add(title)
+    for title in await movie_series_db.get_movie_series_names(1):
+        await prefetch_queue.add(title)
+
+
+async def prefetch_imdb():
+    """Warm the IMDb cache for trending and newly added titles, one lookup
+    every PREFETCH_INTERVAL seconds. Titles leave the queue once fetched."""
+    await prefetch_queue.ensure_indexes()
+    last_trending = 0
+    while 1:
+        if datetime.now().timestamp() - last_trending > 3600:
+            last_trending = datetime.now().timestamp()
+            try:
+                await queue_trending_titles()
+            except Exception as e:
+                print(f"Prefetch queue error: {e}")
+        batch = await prefetch_queue.next_batch()
+        if not batch:
+            await sleep(60)
+            continue
+        for item in batch:
+            title = item["_id"]
+            try:
+                files, _, _ = await get_search_results(title)
+                file = files[0].file_name if files else item.get("file")
+                found, _ = await imdb_cache.get(imdb_cache_key(title, file=file))
+                if not found:
+                    await get_poster(title, file=file)
+                    await sleep(PREFETCH_INTERVAL)
+            except Exception as e:
+                print(f"Prefetch error for {title}: {e}")
+            await prefetch_queue.done(title)
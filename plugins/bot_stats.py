@@ -4,7 +4,10 @@ from pyrogram.errors.exceptions.bad_request_400 import MessageTooLong
 from info import ADMINS, LOG_CHANNEL, USERNAME
 from database.users_chats_db import db
 from database.ia_filterdb import Media, get_files_db_size
+from database.user_state import user_state
 from utils import get_size, temp
+from Jisshu.util.cache import CACHES
+from Jisshu.util.executor import task_stats
 from Script import script
 import psutil
 import time
@@ -117,6 +120,48 @@ async def get_ststs(bot, message):
     )
 
 
+@Client.on_message(filters.command("cachestats") & filters.user(ADMINS))
+async def cache_stats(bot, message):
+    out = "<b>Cache stats</b>\n\n"
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        out += (
+            f"<b>{name}</b> - size <code>{stats['size']}/{cache.maxsize}</code>, "
+            f"hits <code>{stats['hits']}</code>, "
+            f"misses <code>{stats['misses']}</code>, "
+            f"hit rate <code>{stats['hit_rate']}%</code>"
+        )
+        if "bytes" in stats:
+            out += f", memory <code>{get_size(stats['bytes'])}</code>"
+        out += "\n"
+    await message.reply_text(out)
+
+
+@Client.on_message(filters.command("taskstats") & filters.user(ADMINS))
+async def executor_stats(bot, message):
+    out = "<b>Executor task timings</b>\n\n"
+    for name, stats in task_stats().items():
+        out += (
+            f"<b>{name}</b> - calls <code>{stats['calls']}</code>, "
+            f"avg <code>{stats['avg'] * 1000:.1f} ms</code>, "
+            f"max <code>{stats['max'] * 1000:.1f} ms</code>\n"
+        )
+    await message.reply_text(out)
+
+
+@Client.on_message(filters.command("migrate_users") & filters.user(ADMINS))
+async def migrate_users(bot, message):
+    msg = await message.reply("<b>Migrating user data...</b>")
+    try:
+        removed = await user_state.migrate()
+    except Exception as e:
+        return await msg.edit(f"Migration canceled due to Error - {e}")
+    text = "\n".join(f"{col}: {count}" for col, count in removed.items())
+    await msg.edit(
+        f"<b>User data migrated.</b>\n\nDuplicates removed:\n<code>{text}</code>"
+    )
+
+
 @Client.on_message(filters.command("invite") & filters.private & filters.user(ADMINS))
 async def invite(client, message):
     toGenInvLink = message.command[1]
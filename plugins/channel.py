@@ -8,39 +8,14 @@ from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from database.users_chats_db import db
 from database.ia_filterdb import save_file, unpack_new_file_id
+from database.media_fields import extract_title
+from database.prefetch_db import prefetch_queue
+from Jisshu.util.executor import run_cpu
+from Jisshu.util.text import clean_movie_name, parse_movie_file
 import aiohttp
 from typing import Optional
 from collections import defaultdict
 
-CAPTION_LANGUAGES = [
-    "Bhojpuri",
-    "Hindi",
-    "Bengali",
-    "Tamil",
-    "English",
-    "Bangla",
-    "Telugu",
-    "Malayalam",
-    "Kannada",
-    "Marathi",
-    "Punjabi",
-    "Bengoli",
-    "Gujrati",
-    "Korean",
-    "Gujarati",
-    "Spanish",
-    "French",
-    "German",
-    "Chinese",
-    "Arabic",
-    "Portuguese",
-    "Russian",
-    "Japanese",
-    "Odia",
-    "Assamese",
-    "Urdu",
-]
-
 UPDATE_CAPTION = """<blockquote><b>NEW {} ADDED ✅</b></blockquote>
 
 <b>📝 Tɪᴛʟᴇ :</b> <code>{}</code>
@@ -71,6 +46,8 @@ async def media(bot, message):
         media.file_type = message.media.value
         media.caption = message.caption
         success_sts = await save_file(media)
+        if success_sts == "suc" and IMDB_PREFETCH:
+            await prefetch_queue.add(extract_title(media.file_name), media.file_name)
         if success_sts == "suc" and await db.get_send_movie_update_status(bot_id):
             file_id, file_ref = unpack_new_file_id(media.file_id)
             await queue_movie_file(bot, media)
@@ -78,26 +55,14 @@ async def media(bot, message):
 
 async def queue_movie_file(bot, media):
     try:
-        file_name = await movie_name_format(media.file_name)
-        caption = await movie_name_format(media.caption)
-        year_match = re.search(r"\b(19|20)\d{2}\b", caption)
-        year = year_match.group(0) if year_match else None
-        season_match = re.search(r"(?i)(?:s|season)0*(\d{1,2})", caption) or re.search(
-            r"(?i)(?:s|season)0*(\d{1,2})", file_name
-        )
-        if year:
-            file_name = file_name[: file_name.find(year) + 4]
-        elif season_match:
-            season = season_match.group(1)
-            file_name = file_name[: file_name.find(season) + 1]
-        quality = await get_qualities(caption) or "HDRip"
-        jisshuquality = await Jisshu_qualities(caption, media.file_name) or "720p"
-        language = (
-            ", ".join(
-                [lang for lang in CAPTION_LANGUAGES if lang.lower() in caption.lower()]
-            )
-            or "Not Idea"
-        )
+        caption = media.caption and str(media.caption)
+        parsed = await run_cpu(parse_movie_file, media.file_name, caption)
+        file_name = parsed["file_name"]
+        caption = parsed["caption"]
+        year = parsed["year"]
+        quality = parsed["quality"]
+        jisshuquality = parsed["jisshuquality"]
+        language = parsed["language"]
         file_size_str = format_file_size(media.file_size)
         file_id, file_ref = unpack_new_file_id(media.file_id)
         movie_files[file_name].append(
@@ -275,71 +240,8 @@ def generate_unique_id(movie_name):
     return hashlib.md5(movie_name.encode("utf-8")).hexdigest()[:5]
 
 
-async def get_qualities(text):
-    qualities = [
-        "480p",
-        "720p",
-        "720p HEVC",
-        "1080p",
-        "ORG",
-        "org",
-        "hdcam",
-        "HDCAM",
-        "HQ",
-        "hq",
-        "HDRip",
-        "hdrip",
-        "camrip",
-        "WEB-DL",
-        "CAMRip",
-        "hdtc",
-        "predvd",
-        "DVDscr",
-        "dvdscr",
-        "dvdrip",
-        "HDTC",
-        "dvdscreen",
-        "HDTS",
-        "hdts",
-    ]
-    found_qualities = [q for q in qualities if q.lower() in text.lower()]
-    return ", ".join(found_qualities) or "HDRip"
-
-
-async def Jisshu_qualities(text, file_name):
-    qualities = ["480p", "720p", "720p HEVC", "1080p", "1080p HEVC", "2160p"]
-    combined_text = (text.lower() + " " + file_name.lower()).strip()
-    if "hevc" in combined_text:
-        for quality in qualities:
-            if "HEVC" in quality and quality.split()[0].lower() in combined_text:
-                return quality
-    for quality in qualities:
-        if "HEVC" not in quality and quality.lower() in combined_text:
-            return quality
-    return "720p"
-
-
 async def movie_name_format(file_name):
-    filename = re.sub(
-        r"http\S+",
-        "",
-        re.sub(r"@\w+|#\w+", "", file_name)
-        .replace("_", " ")
-        .replace("[", "")
-        .replace("]", "")
-        .replace("(", "")
-        .replace(")", "")
-        .replace("{", "")
-        .replace("}", "")
-        .replace(".", " ")
-        .replace("@", "")
-        .replace(":", "")
-        .replace(";", "")
-        .replace("'", "")
-        .replace("-", "")
-        .replace("!", ""),
-    ).strip()
-    return filename
+    return await run_cpu(clean_movie_name, file_name)
 
 
 def format_file_size(size_bytes):
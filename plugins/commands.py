@@ -19,8 +19,11 @@ from database.ia_filterdb import (
     get_file_details,
     get_bad_files,
     unpack_new_file_id,
+    delete_files,
+    get_files_by_ids,
 )
-from database.users_chats_db import db
+from database.users_chats_db import db, NOT_VERIFIED, verified_today
+from database.sessions import sessions
 from database.config_db import mdb
 from database.topdb import JsTopDB
 from database.jsreferdb import referdb
@@ -29,8 +32,8 @@ from utils import (
     formate_file_name,
     get_settings,
     save_group_settings,
-    is_req_subscribed,
-    is_subscribed,
+    update_group_settings,
+    Access,
     get_size,
     get_shortlink,
     is_check_admin,
@@ -42,12 +45,32 @@ from utils import (
 import re
 import base64
 from info import *
+from Jisshu.util.template import (
+    CAPTION_FIELDS,
+    IMDB_FIELDS,
+    TemplateError,
+    compile_template,
+    render_template,
+)
 
 logger = logging.getLogger(__name__)
 movie_series_db = JsTopDB(DATABASE_URI)
 verification_ids = {}
 
 
+def file_caption(caption, file):
+    values = {
+        "file_name": formate_file_name(file.file_name),
+        "file_size": get_size(file.file_size),
+        "file_caption": file.caption,
+    }
+    try:
+        return render_template(caption, CAPTION_FIELDS, values)
+    except TemplateError as e:
+        logger.error(f"Bad caption template: {e}")
+        return values["file_name"]
+
+
 @Client.on_message(filters.command("start") & filters.incoming)
 async def start(client: Client, message):
     await message.react(emoji=random.choice(REACTIONS))
@@ -56,21 +79,20 @@ async def start(client: Client, message):
     if len(m.command) == 2 and m.command[1].startswith("notcopy"):
         _, userid, verify_id, file_id = m.command[1].split("_", 3)
         user_id = int(userid)
-        grp_id = temp.CHAT.get(user_id, 0)
+        grp_id = await sessions.get("chat", user_id, 0)
         settings = await get_settings(grp_id)
         verify_id_info = await db.get_verify_id_info(user_id, verify_id)
         if not verify_id_info or verify_id_info["verified"]:
             await message.reply("<b>ʟɪɴᴋ ᴇxᴘɪʀᴇᴅ ᴛʀʏ ᴀɢᴀɪɴ...</b>")
             return
         ist_timezone = pytz.timezone("Asia/Kolkata")
-        if await db.user_verified(user_id):
+        misc = dict(NOT_VERIFIED, **await db.get_notcopy_user(user_id))
+        if verified_today(misc["second_time_verified"]):
             key = "third_time_verified"
+        elif verified_today(misc["last_verified"]):
+            key = "second_time_verified"
         else:
-            key = (
-                "second_time_verified"
-                if await db.is_user_verified(user_id)
-                else "last_verified"
-            )
+            key = "last_verified"
         current_time = dt.now(tz=ist_timezone)
         result = await db.update_notcopy_user(user_id, {key: current_time})
         await db.update_verify_id_info(user_id, verify_id, {"verified": True})
@@ -290,8 +312,13 @@ async def start(client: Client, message):
         pre, grp_id, file_id = "", 0, data
 
     settings = await get_settings(int(data.split("_", 2)[1]))
-    if settings.get("fsub_id", AUTH_CHANNEL) == AUTH_REQ_CHANNEL:
-        if AUTH_REQ_CHANNEL and not await is_req_subscribed(client, message):
+    fsub_id = settings.get("fsub_id", AUTH_CHANNEL)
+    channels = [AUTH_CHANNEL]
+    if fsub_id != AUTH_REQ_CHANNEL:
+        channels.append(fsub_id)
+    access = await Access(client, m.from_user.id, settings).load(channels)
+    if fsub_id == AUTH_REQ_CHANNEL:
+        if AUTH_REQ_CHANNEL and not await access.req_subscribed():
             try:
                 invite_link = await client.create_chat_invite_link(
                     int(AUTH_REQ_CHANNEL), creates_join_request=True
@@ -320,12 +347,9 @@ async def start(client: Client, message):
             )
             return
     else:
-        id = settings.get("fsub_id", AUTH_CHANNEL)
-        channel = int(id)
+        channel = int(fsub_id)
         btn = []
-        if channel != AUTH_CHANNEL and not await is_subscribed(
-            client, message.from_user.id, channel
-        ):
+        if channel != AUTH_CHANNEL and not await access.subscribed(channel):
             invite_link_custom = await client.create_chat_invite_link(channel)
             btn.append(
                 [
@@ -334,7 +358,7 @@ async def start(client: Client, message):
                     )
                 ]
             )
-        if not await is_req_subscribed(client, message):
+        if not await access.req_subscribed():
             invite_link_default = await client.create_chat_invite_link(
                 int(AUTH_CHANNEL), creates_join_request=True
             )
@@ -346,8 +370,8 @@ async def start(client: Client, message):
                 ]
             )
         if message.command[1] != "subscribe" and (
-            await is_req_subscribed(client, message) is False
-            or await is_subscribed(client, message.from_user.id, channel) is False
+            await access.req_subscribed() is False
+            or await access.subscribed(channel) is False
         ):
             btn.append(
                 [
@@ -368,18 +392,12 @@ async def start(client: Client, message):
             return
 
     user_id = m.from_user.id
-    if not await db.has_premium_access(user_id):
+    if not access.premium:
         grp_id = int(grp_id)
         print(f"Group Id - {grp_id}")
-        user_verified = await db.is_user_verified(user_id)
-        settings = await get_settings(grp_id)
-        print(f"Id Settings - {settings}")
-        is_second_shortener = await db.use_second_shortener(
-            user_id, settings.get("verify_time", TWO_VERIFY_GAP)
-        )
-        is_third_shortener = await db.use_third_shortener(
-            user_id, settings.get("third_verify_time", THREE_VERIFY_GAP)
-        )
+        user_verified = access.verified
+        is_second_shortener = access.second_shortener
+        is_third_shortener = access.third_shortener
         if (
             settings.get("is_verify", IS_VERIFY)
             and not user_verified
@@ -390,7 +408,7 @@ async def start(client: Client, message):
                 random.choices(string.ascii_uppercase + string.digits, k=7)
             )
             await db.create_verify_id(user_id, verify_id)
-            temp.CHAT[user_id] = grp_id
+            await sessions.set("chat", user_id, grp_id)
             if message.command[1].startswith("allfiles"):
                 verify = await get_shortlink(
                     f"https://telegram.me/{temp.U_NAME}?start=jisshu_{user_id}_{verify_id}_{file_id}",
@@ -426,7 +444,7 @@ async def start(client: Client, message):
                 ],
             ]
             reply_markup = InlineKeyboardMarkup(buttons)
-            if await db.user_verified(user_id):
+            if access.second_verified:
                 msg = script.THIRDT_VERIFICATION_TEXT
             else:
                 msg = (
@@ -447,21 +465,17 @@ async def start(client: Client, message):
 
     if data and data.startswith("allfiles"):
         _, grp_id, key = data.split("_", 2)
-        files = temp.FILES_ID.get(key)
+        file_ids = await sessions.get("files", key)
+        files = await get_files_by_ids(file_ids) if file_ids else []
         if not files:
             await message.reply_text("<b>⚠️ ᴀʟʟ ꜰɪʟᴇs ɴᴏᴛ ꜰᴏᴜɴᴅ ⚠️</b>")
             return
         files_to_delete = []
+        user_id = message.from_user.id
+        grp_id = await sessions.get("chat", user_id)
+        settings = await get_settings(grp_id)
         for file in files:
-            user_id = message.from_user.id
-            grp_id = temp.CHAT.get(user_id)
-            settings = await get_settings(grp_id)
-            CAPTION = settings["caption"]
-            f_caption = CAPTION.format(
-                file_name=formate_file_name(file.file_name),
-                file_size=get_size(file.file_size),
-                file_caption=file.caption,
-            )
+            f_caption = file_caption(settings["caption"], file)
             btn = [
                 [
                     InlineKeyboardButton(
@@ -514,12 +528,7 @@ async def start(client: Client, message):
         return await message.reply("<b>⚠️ ᴀʟʟ ꜰɪʟᴇs ɴᴏᴛ ꜰᴏᴜɴᴅ ⚠️</b>")
     files = files_[0]
     settings = await get_settings(grp_id)
-    CAPTION = settings["caption"]
-    f_caption = CAPTION.format(
-        file_name=formate_file_name(files.file_name),
-        file_size=get_size(files.file_size),
-        file_caption=files.caption,
-    )
+    f_caption = file_caption(settings["caption"], files)
     btn = [
         [
             InlineKeyboardButton(
@@ -574,33 +583,33 @@ async def delete(bot, message):
         return
 
     file_id, file_ref = unpack_new_file_id(media.file_id)
-    result = await Media.collection.delete_one(
+    deleted = await delete_files(
         {
             "_id": file_id,
         }
     )
-    if result.deleted_count:
+    if deleted:
         await msg.edit("<b>ꜰɪʟᴇ ɪs sᴜᴄᴄᴇssꜰᴜʟʟʏ ᴅᴇʟᴇᴛᴇᴅ ꜰʀᴏᴍ ᴅᴀᴛᴀʙᴀsᴇ 💥</b>")
     else:
         file_name = re.sub(r"(_|\-|\.|\+)", " ", str(media.file_name))
-        result = await Media.collection.delete_many(
+        deleted = await delete_files(
             {
                 "file_name": file_name,
                 "file_size": media.file_size,
                 "mime_type": media.mime_type,
             }
         )
-        if result.deleted_count:
+        if deleted:
             await msg.edit("<b>ꜰɪʟᴇ ɪs sᴜᴄᴄᴇssꜰᴜʟʟʏ ᴅᴇʟᴇᴛᴇᴅ ꜰʀᴏᴍ ᴅᴀᴛᴀʙᴀsᴇ 💥</b>")
         else:
-            result = await Media.collection.delete_many(
+            deleted = await delete_files(
                 {
                     "file_name": media.file_name,
                     "file_size": media.file_size,
                     "mime_type": media.mime_type,
                 }
             )
-            if result.deleted_count:
+            if deleted:
                 await msg.edit("<b>ꜰɪʟᴇ ɪs sᴜᴄᴄᴇssꜰᴜʟʟʏ ᴅᴇʟᴇᴛᴇᴅ ꜰʀᴏᴍ ᴅᴀᴛᴀʙᴀsᴇ 💥</b>")
             else:
                 await msg.edit("<b>ꜰɪʟᴇ ɴᴏᴛ ꜰᴏᴜɴᴅ ɪɴ ᴅᴀᴛᴀʙᴀsᴇ</b>")
@@ -718,6 +727,13 @@ async def save_template(client, message):
         template = message.text.split(" ", 1)[1]
     except:
         return await message.reply_text("Command Incomplete!")
+    try:
+        compile_template(template, IMDB_FIELDS)
+    except TemplateError as e:
+        return await message.reply_text(
+            f"<b>Invalid template: <code>{e}</code></b>\n\n"
+            f"Available placeholders: <code>{', '.join(sorted(IMDB_FIELDS))}</code>"
+        )
     await save_group_settings(grp_id, "template", template)
     await message.reply_text(
         f"Successfully changed template for {title} to\n\n{template}",
@@ -868,7 +884,7 @@ async def deletemultiplefiles(bot, message):
 
 
 @Client.on_message(filters.command("del_file"))
-async def delete_files(bot, message):
+async def del_file_cmd(bot, message):
     if message.from_user.id not in ADMINS:
         await message.reply("Only the bot owner can use this command... 😑")
         return
@@ -886,8 +902,8 @@ async def delete_files(bot, message):
     deleted_files_count = 0
     not_found_files = []
     for keyword in keywords:
-        result = await Media.collection.delete_many({"file_name": keyword.strip()})
-        if result.deleted_count:
+        deleted = await delete_files({"file_name": keyword.strip()})
+        if deleted:
             deleted_files_count += 1
         else:
             not_found_files.append(keyword.strip())
@@ -914,6 +930,13 @@ async def save_caption(client, message):
         caption = message.text.split(" ", 1)[1]
     except:
         return await message.reply_text("Command Incomplete!")
+    try:
+        compile_template(caption, CAPTION_FIELDS)
+    except TemplateError as e:
+        return await message.reply_text(
+            f"<b>Invalid caption: <code>{e}</code></b>\n\n"
+            f"Available placeholders: <code>{', '.join(sorted(CAPTION_FIELDS))}</code>"
+        )
     await save_group_settings(grp_id, "caption", caption)
     await message.reply_text(
         f"Successfully changed caption for {title} to\n\n{caption}",
@@ -1017,8 +1040,7 @@ async def set_shortner(c, m):
         ).json()
         if resp["status"] == "success":
             SHORT_LINK = resp["shortenedUrl"]
-        await save_group_settings(grp_id, "shortner", URL)
-        await save_group_settings(grp_id, "api", API)
+        await update_group_settings(grp_id, {"shortner": URL, "api": API})
         await m.reply_text(
             f"<b><u>✓ sᴜᴄᴄᴇssꜰᴜʟʟʏ ʏᴏᴜʀ sʜᴏʀᴛɴᴇʀ ɪs ᴀᴅᴅᴇᴅ</u>\n\nᴅᴇᴍᴏ - {SHORT_LINK}\n\nsɪᴛᴇ - `{URL}`\n\nᴀᴘɪ - `{API}`</b>",
             quote=True,
@@ -1036,8 +1058,9 @@ async def set_shortner(c, m):
             LOG_API_CHANNEL, log_message, disable_web_page_preview=True
         )
     except Exception as e:
-        await save_group_settings(grp_id, "shortner", SHORTENER_WEBSITE)
-        await save_group_settings(grp_id, "api", SHORTENER_API)
+        await update_group_settings(
+            grp_id, {"shortner": SHORTENER_WEBSITE, "api": SHORTENER_API}
+        )
         await m.reply_text(
             f"<b><u>💢 ᴇʀʀᴏʀ ᴏᴄᴄᴏᴜʀᴇᴅ!!</u>\n\nᴀᴜᴛᴏ ᴀᴅᴅᴇᴅ ʙᴏᴛ ᴏᴡɴᴇʀ ᴅᴇꜰᴜʟᴛ sʜᴏʀᴛɴᴇʀ\n\nɪꜰ ʏᴏᴜ ᴡᴀɴᴛ ᴛᴏ ᴄʜᴀɴɢᴇ ᴛʜᴇɴ ᴜsᴇ ᴄᴏʀʀᴇᴄᴛ ꜰᴏʀᴍᴀᴛ ᴏʀ ᴀᴅᴅ ᴠᴀʟɪᴅ sʜᴏʀᴛʟɪɴᴋ ᴅᴏᴍᴀɪɴ ɴᴀᴍᴇ & ᴀᴘɪ\n\nʏᴏᴜ ᴄᴀɴ ᴀʟsᴏ ᴄᴏɴᴛᴀᴄᴛ ᴏᴜʀ <a href=https://telegram.me/+JWsoDEJEB9EyNDU1>sᴜᴘᴘᴏʀᴛ ɢʀᴏᴜᴘ</a> ꜰᴏʀ sᴏʟᴠᴇ ᴛʜɪs ɪssᴜᴇ...\n\nʟɪᴋᴇ -\n\n`/set_shortner mdiskshortner.link e7beb3c8f756dfa15d0bec495abc65f58c0dfa95`\n\n💔 ᴇʀʀᴏʀ - <code>{e}</code></b>",
             quote=True,
@@ -1068,8 +1091,7 @@ async def set_shortner_2(c, m):
         ).json()
         if resp["status"] == "success":
             SHORT_LINK = resp["shortenedUrl"]
-        await save_group_settings(grp_id, "shortner_two", URL)
-        await save_group_settings(grp_id, "api_two", API)
+        await update_group_settings(grp_id, {"shortner_two": URL, "api_two": API})
         await m.reply_text(
             f"<b><u>✅ sᴜᴄᴄᴇssꜰᴜʟʟʏ ʏᴏᴜʀ sʜᴏʀᴛɴᴇʀ ɪs ᴀᴅᴅᴇᴅ</u>\n\nᴅᴇᴍᴏ - {SHORT_LINK}\n\nsɪᴛᴇ - `{URL}`\n\nᴀᴘɪ - `{API}`</b>",
             quote=True,
@@ -1087,8 +1109,9 @@ async def set_shortner_2(c, m):
             LOG_API_CHANNEL, log_message, disable_web_page_preview=True
         )
     except Exception as e:
-        await save_group_settings(grp_id, "shortner_two", SHORTENER_WEBSITE2)
-        await save_group_settings(grp_id, "api_two", SHORTENER_API2)
+        await update_group_settings(
+            grp_id, {"shortner_two": SHORTENER_WEBSITE2, "api_two": SHORTENER_API2}
+        )
         await m.reply_text(
             f"<b><u>💢 ᴇʀʀᴏʀ ᴏᴄᴄᴏᴜʀᴇᴅ!!</u>\n\nᴀᴜᴛᴏ ᴀᴅᴅᴇᴅ ʙᴏᴛ ᴏᴡɴᴇʀ ᴅᴇꜰᴜʟᴛ sʜᴏʀᴛɴᴇʀ\n\nɪꜰ ʏᴏᴜ ᴡᴀɴᴛ ᴛᴏ ᴄʜᴀɴɢᴇ ᴛʜᴇɴ ᴜsᴇ ᴄᴏʀʀᴇᴄᴛ ꜰᴏʀᴍᴀᴛ ᴏʀ ᴀᴅᴅ ᴠᴀʟɪᴅ sʜᴏʀᴛʟɪɴᴋ ᴅᴏᴍᴀɪɴ ɴᴀᴍᴇ & ᴀᴘɪ\n\nʏᴏᴜ ᴄᴀɴ ᴀʟsᴏ ᴄᴏɴᴛᴀᴄᴛ ᴏᴜʀ <a href=https://telegram.me/+JWsoDEJEB9EyNDU1>sᴜᴘᴘᴏʀᴛ ɢʀᴏᴜᴘ</a> ꜰᴏʀ sᴏʟᴠᴇ ᴛʜɪs ɪssᴜᴇ...\n\nʟɪᴋᴇ -\n\n`/set_shortner_2 mdiskshortner.link e7beb3c8f756dfa15d0bec495abc65f58c0dfa95`\n\n💔 ᴇʀʀᴏʀ - <code>{e}</code></b>",
             quote=True,
@@ -1129,8 +1152,7 @@ async def set_shortner_3(c, m):
         ).json()
         if resp["status"] == "success":
             SHORT_LINK = resp["shortenedUrl"]
-        await save_group_settings(grp_id, "shortner_three", URL)
-        await save_group_settings(grp_id, "api_three", API)
+        await update_group_settings(grp_id, {"shortner_three": URL, "api_three": API})
         await m.reply_text(
             f"<b><u>✅ sᴜᴄᴄᴇssꜰᴜʟʟʏ ʏᴏᴜʀ sʜᴏʀᴛɴᴇʀ ɪs ᴀᴅᴅᴇᴅ</u>\n\nᴅᴇᴍᴏ - {SHORT_LINK}\n\nsɪᴛᴇ - `{URL}`\n\nᴀᴘɪ - `{API}`</b>",
             quote=True,
@@ -1147,8 +1169,9 @@ async def set_shortner_3(c, m):
             LOG_API_CHANNEL, log_message, disable_web_page_preview=True
         )
     except Exception as e:
-        await save_group_settings(grp_id, "shortner_three", SHORTENER_WEBSITE3)
-        await save_group_settings(grp_id, "api_three", SHORTENER_API3)
+        await update_group_settings(
+            grp_id, {"shortner_three": SHORTENER_WEBSITE3, "api_three": SHORTENER_API3}
+        )
         await m.reply_text(
             f"<b><u>💢 ᴇʀʀᴏʀ ᴏᴄᴄᴏᴜʀᴇᴅ!!</u>\n\nᴀᴜᴛᴏ ᴀᴅᴅᴇᴅ ʙᴏᴛ ᴏᴡɴᴇʀ ᴅᴇꜰᴜʟᴛ sʜᴏʀᴛɴᴇʀ\n\nɪꜰ ʏᴏᴜ ᴡᴀɴᴛ ᴛᴏ ᴄʜᴀɴɢᴇ ᴛʜᴇɴ ᴜsᴇ ᴄᴏʀʀᴇᴄᴛ ꜰᴏʀᴍᴀᴛ ᴏʀ ᴀᴅᴅ ᴠᴀʟɪᴅ sʜᴏʀᴛʟɪɴᴋ ᴅᴏᴍᴀɪɴ ɴᴀᴍᴇ & ᴀᴘɪ\n\nʏᴏᴜ ᴄᴀɴ ᴀʟsᴏ ᴄᴏɴᴛᴀᴄᴛ ᴏᴜʀ <a href=https://telegram.me/+JWsoDEJEB9EyNDU1>sᴜᴘᴘᴏʀᴛ ɢʀᴏᴜᴘ</a> ꜰᴏʀ sᴏʟᴠᴇ ᴛʜɪs ɪssᴜᴇ...\n\nʟɪᴋᴇ -\n\n`/set_shortner_3 mdiskshortner.link e7beb3c8f756dfa15d0bec495abc65f58c0dfa95`\n\n💔 ᴇʀʀᴏʀ - <code>{e}</code></b>",
             quote=True,
@@ -1,7 +1,7 @@
 import logging
 from pyrogram import Client, filters
 from info import DELETE_CHANNELS, LOG_CHANNEL
-from database.ia_filterdb import Media, unpack_new_file_id
+from database.ia_filterdb import delete_files, unpack_new_file_id
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +14,7 @@ async def deletemultiplemedia(bot, message):
     if media.mime_type in ["video/mp4", "video/x-matroska"]:
         file_id, _ = unpack_new_file_id(media.file_id)
         try:
-            result = await Media.find_one({"file_id": file_id})
-            if result:
-                await result.delete()
+            if await delete_files({"_id": file_id}):
                 logger.info(
                     f"File {media.file_name} with ID {file_id} deleted from database"
                 )
@@ -1,4 +1,5 @@
 from plugins.helper.fotnt_string import Fonts
+from Jisshu.util.executor import run_cpu
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -185,7 +186,7 @@ async def style(c, m):
         cls = Fonts.frozen
 
     r, oldtxt = m.message.reply_to_message.text.split(None, 1)
-    new_text = cls(oldtxt)
+    new_text = await run_cpu(cls, oldtxt)
     try:
         await m.message.edit_text(
             f"`{new_text}`\n\n👆 Click To Copy", reply_markup=m.message.reply_markup
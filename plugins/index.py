@@ -2,7 +2,7 @@ import asyncio
 from pyrogram import Client, filters, enums
 from pyrogram.errors import FloodWait
 from info import ADMINS, CHANNELS
-from database.ia_filterdb import save_file
+from database.ia_filterdb import save_file, backfill_media_fields
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from utils import temp, get_readable_time
 import time
@@ -97,6 +97,25 @@ async def channel_info(bot, message):
     await message.reply(text)
 
 
+@Client.on_message(
+    filters.command("backfill") & filters.private & filters.incoming & filters.user(ADMINS)
+)
+async def backfill_fields(bot, message):
+    if lock.locked():
+        return await message.reply("Wait until previous process complete.")
+    msg = await message.reply("<b>Backfilling search fields...</b>")
+    start_time = time.time()
+    async with lock:
+        try:
+            updated = await backfill_media_fields()
+        except Exception as e:
+            return await msg.edit(f"Backfill canceled due to Error - {e}")
+    time_taken = get_readable_time(time.time() - start_time)
+    await msg.edit(
+        f"Succesfully updated <code>{updated}</code> files!\nCompleted in {time_taken}"
+    )
+
+
 async def index_files_to_db(lst_msg_id, chat, msg, bot, skip):
     start_time = time.time()
     total_files = 0
@@ -1,15 +1,24 @@
 from pyrogram import Client, filters
-from pyrogram.types import ChatJoinRequest
+from pyrogram.types import ChatJoinRequest, ChatMemberUpdated
 from database.users_chats_db import db
 from info import ADMINS, AUTH_CHANNEL
+from utils import forget_member
 
 
 @Client.on_chat_join_request(filters.chat(AUTH_CHANNEL))
 async def join_reqs(client, message: ChatJoinRequest):
+    forget_member(message.chat.id, message.from_user.id)
     if not await db.find_join_req(message.from_user.id):
         await db.add_join_req(message.from_user.id)
 
 
+@Client.on_chat_member_updated()
+async def member_updated(client, update: ChatMemberUpdated):
+    member = update.new_chat_member or update.old_chat_member
+    if member and member.user:
+        forget_member(update.chat.id, member.user.id)
+
+
 @Client.on_message(filters.command("delreq") & filters.private & filters.user(ADMINS))
 async def del_requests(client, message):
     await db.del_join_req()
@@ -1,6 +1,7 @@
 import asyncio
 import re
 import math
+from collections import ChainMap
 from pyrogram.errors.exceptions.bad_request_400 import (
     MediaEmpty,
     PhotoInvalidDimensions,
@@ -23,35 +24,38 @@ from utils import (
     temp,
     get_settings,
     is_check_admin,
-    get_size,
     save_group_settings,
+    update_group_settings,
     get_poster,
     get_status,
     get_readable_time,
-    imdb,
-    formate_file_name,
+    result_rows,
+    file_link,
 )
 from database.users_chats_db import db
 from database.ia_filterdb import (
     Media,
     get_search_results,
     get_bad_files,
+    delete_files,
+    delete_all_files,
+    suggest_titles,
+    get_facet_counts,
 )
+from database.media_fields import quality_key
+from database.search_index import tokenize
+from database.sessions import sessions
 import random
 
 lock = asyncio.Lock()
 import traceback
-from fuzzywuzzy import process
-
-BUTTONS = {}
-FILES_ID = {}
-CAP = {}
 
 from database.jsreferdb import referdb
 from database.config_db import mdb
 import logging
 from urllib.parse import quote_plus
 from Jisshu.util.file_properties import get_name, get_hash
+from Jisshu.util.template import IMDB_FIELDS, TemplateError, render_template
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.ERROR)
@@ -225,614 +229,59 @@ async def refercall(bot, query):
     await query.answer()
 
 
-@Client.on_callback_query(filters.regex("admincmd"))
-async def admin_commands(client, query):
-    if query.from_user.id not in ADMINS:
-        return await query.answer("ᴛʜɪꜱ ɪꜱ ɴᴏᴛ ꜰᴏʀ ʏᴏᴜ ʙʀᴏ!", show_alert=True)
-
-    buttons = [
-        [
-            InlineKeyboardButton("⋞ ʙᴀᴄᴋ", callback_data="help"),
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(buttons)
-
-    await client.edit_message_media(
-        chat_id=query.message.chat.id,
-        message_id=query.message.id,
-        media=InputMediaAnimation(
-            media="https://cdn.jsdelivr.net/gh/Jisshubot/JISSHU_BOTS/Video.mp4/Welcome_video_20240921_184741_0001.gif",
-            caption=script.ADMIN_CMD_TXT,
-            parse_mode=enums.ParseMode.HTML,
-        ),
-        reply_markup=reply_markup,
-    )
-
-
-@Client.on_callback_query(filters.regex(r"^next"))
-async def next_page(bot, query):
-    ident, req, key, offset = query.data.split("_")
-    if int(req) not in [query.from_user.id, 0]:
-        return await query.answer(
-            script.ALRT_TXT.format(query.from_user.first_name), show_alert=True
-        )
-    try:
-        offset = int(offset)
-    except:
-        offset = 0
-    search = BUTTONS.get(key)
-    cap = CAP.get(key)
-    if not search:
-        await query.answer(
-            script.OLD_ALRT_TXT.format(query.from_user.first_name), show_alert=True
-        )
-        return
-    files, n_offset, total = await get_search_results(search, offset=offset)
-    try:
-        n_offset = int(n_offset)
-    except:
-        n_offset = 0
-    if not files:
-        return
-    temp.FILES_ID[key] = files
-    ads, ads_name, _ = await mdb.get_advirtisment()
-    ads_text = ""
-    if ads is not None and ads_name is not None:
-        ads_url = f"https://telegram.dog/{temp.U_NAME}?start=ads"
-        ads_text = f"<a href={ads_url}>{ads_name}</a>"
-    js_ads = (
-        f"\n━━━━━━━━━━━━━━━━━━\n <b>{ads_text}</b> \n━━━━━━━━━━━━━━━━━━"
-        if ads_text
-        else ""
-    )
-    settings = await get_settings(query.message.chat.id)
-    reqnxt = query.from_user.id if query.from_user else 0
-    temp.CHAT[query.from_user.id] = query.message.chat.id
-    links = ""
-    if settings["link"]:
-        btn = []
-        for file_num, file in enumerate(files, start=offset + 1):
-            links += f"""<b>\n\n{file_num}. <a href=https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{file.file_id}>[{get_size(file.file_size)}] {' '.join(filter(lambda x: not x.startswith('[') and not x.startswith('@') and not x.startswith('www.'), file.file_name.split()))}</a></b>"""
-    else:
-        btn = [
-            [
-                InlineKeyboardButton(
-                    text=f"📁 {get_size(file.file_size)}≽ {formate_file_name(file.file_name)}",
-                    url=f"https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{file.file_id}",
-                ),
-            ]
-            for file in files
-        ]
-    btn.insert(
-        0,
-        [
-            InlineKeyboardButton(
-                "📥 sᴇɴᴅ ᴀʟʟ ғɪʟᴇs 📥", callback_data=f"send_all#{key}"
-            ),
-        ],
-    )
-    btn.insert(
-        1,
-        [
-            InlineKeyboardButton(
-                "ǫᴜᴀʟɪᴛʏ ", callback_data=f"qualities#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ꜱᴇᴀꜱᴏɴ", callback_data=f"seasons#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ʟᴀɴɢᴜᴀɢᴇ ", callback_data=f"languages#{key}#{offset}#{req}"
-            ),
-        ],
-    )
-
-    if 0 < offset <= int(MAX_BTN):
-        off_set = 0
-    elif offset == 0:
-        off_set = None
-    else:
-        off_set = offset - int(MAX_BTN)
-    if n_offset == 0:
-
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ", callback_data=f"next_{req}_{key}_{off_set}"
-                ),
-                InlineKeyboardButton(
-                    f"ᴘᴀɢᴇ {math.ceil(int(offset) / int(MAX_BTN)) + 1} / {math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-            ]
-        )
-    elif off_set is None:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    f"{math.ceil(int(offset) / int(MAX_BTN)) + 1} / {math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-                InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟", callback_data=f"next_{req}_{key}_{n_offset}"
-                ),
-            ]
-        )
-    else:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ", callback_data=f"next_{req}_{key}_{off_set}"
-                ),
-                InlineKeyboardButton(
-                    f"{math.ceil(int(offset) / int(MAX_BTN)) + 1} / {math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-                InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟", callback_data=f"next_{req}_{key}_{n_offset}"
-                ),
-            ],
-        )
-    if settings["link"]:
-        links = ""
-        for file_num, file in enumerate(files, start=offset + 1):
-            links += f"""<b>\n\n{file_num}. <a href=https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{file.file_id}>[{get_size(file.file_size)}] {' '.join(filter(lambda x: not x.startswith('[') and not x.startswith('@') and not x.startswith('www.'), file.file_name.split()))}</a></b>"""
-        await query.message.edit_text(
-            cap + links + js_ads,
-            disable_web_page_preview=True,
-            parse_mode=enums.ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup(btn),
-        )
-        return
-    try:
-        await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(btn))
-    except MessageNotModified:
-        pass
-    await query.answer()
-
-
-@Client.on_callback_query(filters.regex(r"^seasons#"))
-async def seasons_cb_handler(client: Client, query: CallbackQuery):
-    _, key, offset, req = query.data.split("#")
-    if int(req) != query.from_user.id:
-        return await query.answer(script.ALRT_TXT, show_alert=True)
-    btn = []
-    for i in range(0, len(SEASONS) - 1, 2):
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    text=SEASONS[i].title(),
-                    callback_data=f"season_search#{SEASONS[i].lower()}#{key}#0#{offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    text=SEASONS[i + 1].title(),
-                    callback_data=f"season_search#{SEASONS[i+1].lower()}#{key}#0#{offset}#{req}",
-                ),
-            ]
-        )
-
-    btn.append(
-        [
-            InlineKeyboardButton(
-                text="⋞ ʙᴀᴄᴋ ᴛᴏ ᴍᴀɪɴ ᴘᴀɢᴇ", callback_data=f"next_{req}_{key}_{offset}"
-            )
-        ]
-    )
-    await query.message.edit_text(
-        "<b>ɪɴ ᴡʜɪᴄʜ sᴇᴀsᴏɴ ᴅᴏ ʏᴏᴜ ᴡᴀɴᴛ, ᴄʜᴏᴏsᴇ ғʀᴏᴍ ʜᴇʀᴇ ↓↓</b>",
-        reply_markup=InlineKeyboardMarkup(btn),
-    )
-    return
-
-
-@Client.on_callback_query(filters.regex(r"^season_search#"))
-async def season_search(client: Client, query: CallbackQuery):
-    _, season, key, offset, orginal_offset, req = query.data.split("#")
-    seas = int(season.split(" ", 1)[1])
-    if seas < 10:
-        seas = f"S0{seas}"
-    else:
-        seas = f"S{seas}"
-
-    if int(req) != query.from_user.id:
-        return await query.answer(script.ALRT_TXT, show_alert=True)
-    offset = int(offset)
-    search = BUTTONS.get(key)
-    cap = CAP.get(key)
-    if not search:
-        await query.answer(
-            script.OLD_ALRT_TXT.format(query.from_user.first_name), show_alert=True
-        )
-        return
-    search = search.replace("_", " ")
-    files, n_offset, total = await get_search_results(
-        f"{search} {seas}", max_results=int(MAX_BTN), offset=offset
-    )
-    files2, n_offset2, total2 = await get_search_results(
-        f"{search} {season}", max_results=int(MAX_BTN), offset=offset
-    )
-    total += total2
-    try:
-        n_offset = int(n_offset)
-    except:
-        try:
-            n_offset = int(n_offset2)
-        except:
-            n_offset = 0
-    files = [file for file in files if re.search(seas, file.file_name, re.IGNORECASE)]
-
-    if not files:
-        files = [
-            file for file in files2 if re.search(season, file.file_name, re.IGNORECASE)
-        ]
-        if not files:
-            await query.answer(
-                f"sᴏʀʀʏ {season.title()} ɴᴏᴛ ғᴏᴜɴᴅ ғᴏʀ {search}", show_alert=1
-            )
-            return
-
-    temp.FILES_ID[key] = files
-    reqnxt = query.from_user.id if query.from_user else 0
-    settings = await get_settings(query.message.chat.id)
-    temp.CHAT[query.from_user.id] = query.message.chat.id
-    ads, ads_name, _ = await mdb.get_advirtisment()
-    ads_text = ""
-    if ads is not None and ads_name is not None:
-        ads_url = f"https://telegram.dog/{temp.U_NAME}?start=ads"
-        ads_text = f"<a href={ads_url}>{ads_name}</a>"
-    js_ads = (
-        f"\n━━━━━━━━━━━━━━━━━━\n <b>{ads_text}</b> \n━━━━━━━━━━━━━━━━━━"
-        if ads_text
-        else ""
-    )
-    links = ""
-    if settings["link"]:
-        btn = []
-        for file_num, file in enumerate(files, start=offset + 1):
-            links += f"""<b>\n\n{file_num}. <a href=https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{file.file_id}>[{get_size(file.file_size)}] {' '.join(filter(lambda x: not x.startswith('[') and not x.startswith('@') and not x.startswith('www.'), file.file_name.split()))}</a></b>"""
-    else:
-        btn = [
-            [
-                InlineKeyboardButton(
-                    text=f"🔗 {get_size(file.file_size)}≽ {formate_file_name(file.file_name)}",
-                    callback_data=f"cfiles#{reqnxt}#{file.file_id}",
-                ),
-            ]
-            for file in files
-        ]
-
-    btn.insert(
-        0,
-        [
-            InlineKeyboardButton(
-                "📥 sᴇɴᴅ ᴀʟʟ ғɪʟᴇs 📥", callback_data=f"send_all#{key}"
-            ),
-        ],
-    )
-    btn.insert(
-        1,
-        [
-            InlineKeyboardButton(
-                "ǫᴜᴀʟɪᴛʏ ", callback_data=f"qualities#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ꜱᴇᴀꜱᴏɴ", callback_data=f"seasons#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ʟᴀɴɢᴜᴀɢᴇ ", callback_data=f"languages#{key}#{offset}#{req}"
-            ),
-        ],
-    )
-
-    if n_offset == "":
-        btn.append(
-            [InlineKeyboardButton(text="🚸 ɴᴏ ᴍᴏʀᴇ ᴘᴀɢᴇs 🚸", callback_data="buttons")]
-        )
-    elif n_offset == 0:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"season_search#{season}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-            ]
-        )
-    elif offset == 0:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-                InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟",
-                    callback_data=f"season_search#{season}#{key}#{n_offset}#{orginal_offset}#{req}",
-                ),
-            ]
-        )
-    else:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"season_search#{season}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-                InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟",
-                    callback_data=f"season_search#{season}#{key}#{n_offset}#{orginal_offset}#{req}",
-                ),
-            ]
-        )
-
-    btn.append(
-        [
-            InlineKeyboardButton(
-                text="⋞ ʙᴀᴄᴋ ᴛᴏ ᴍᴀɪɴ ᴘᴀɢᴇ",
-                callback_data=f"next_{req}_{key}_{orginal_offset}",
-            ),
-        ]
-    )
-    await query.message.edit_text(
-        cap + links + js_ads,
-        disable_web_page_preview=True,
-        parse_mode=enums.ParseMode.HTML,
-        reply_markup=InlineKeyboardMarkup(btn),
-    )
-    return
-
-
-@Client.on_callback_query(filters.regex(r"^years#"))
-async def years_cb_handler(client: Client, query: CallbackQuery):
-    _, key, offset, req = query.data.split("#")
-    if int(req) != query.from_user.id:
-        return await query.answer(script.ALRT_TXT, show_alert=True)
-    btn = []
-    for i in range(0, len(YEARS) - 1, 2):
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    text=YEARS[i].title(),
-                    callback_data=f"years_search#{YEARS[i].lower()}#{key}#0#{offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    text=YEARS[i + 1].title(),
-                    callback_data=f"years_search#{YEARS[i+1].lower()}#{key}#0#{offset}#{req}",
-                ),
-            ]
-        )
-
-    btn.append(
-        [
-            InlineKeyboardButton(
-                text="⋞ ʙᴀᴄᴋ ᴛᴏ ᴍᴀɪɴ ᴘᴀɢᴇ", callback_data=f"next_{req}_{key}_{offset}"
-            )
-        ]
-    )
-    await query.message.edit_text(
-        "<b>ɪɴ ᴡʜɪᴄʜ ʏᴇᴀʀ ᴅᴏ ʏᴏᴜ ᴡᴀɴᴛ, ᴄʜᴏᴏsᴇ ғʀᴏᴍ ʜᴇʀᴇ ↓↓</b>",
-        reply_markup=InlineKeyboardMarkup(btn),
-    )
-    return
-
-
-@Client.on_callback_query(filters.regex(r"^years_search#"))
-async def year_search(client: Client, query: CallbackQuery):
-    _, year, key, offset, orginal_offset, req = query.data.split("#")
-    if int(req) != query.from_user.id:
-        return await query.answer(script.ALRT_TXT, show_alert=True)
-    offset = int(offset)
-    search = BUTTONS.get(key)
-    cap = CAP.get(key)
-    if not search:
-        await query.answer(
-            script.OLD_ALRT_TXT.format(query.from_user.first_name), show_alert=True
-        )
-        return
-    search = search.replace("_", " ")
-    files, n_offset, total = await get_search_results(
-        f"{search} {year}", max_results=int(MAX_BTN), offset=offset
-    )
-    try:
-        n_offset = int(n_offset)
-    except:
-        n_offset = 0
-    files = [file for file in files if re.search(year, file.file_name, re.IGNORECASE)]
-    if not files:
-        await query.answer(
-            f"sᴏʀʀʏ ʏᴇᴀʀ {year.title()} ɴᴏᴛ ғᴏᴜɴᴅ ғᴏʀ {search}", show_alert=1
-        )
-        return
-
-    temp.FILES_ID[key] = files
-    reqnxt = query.from_user.id if query.from_user else 0
-    settings = await get_settings(query.message.chat.id)
-    temp.CHAT[query.from_user.id] = query.message.chat.id
-    ads, ads_name, _ = await mdb.get_advirtisment()
-    ads_text = ""
-    if ads is not None and ads_name is not None:
-        ads_url = f"https://telegram.dog/{temp.U_NAME}?start=ads"
-        ads_text = f"<a href={ads_url}>{ads_name}</a>"
-    js_ads = (
-        f"\n━━━━━━━━━━━━━━━━━━\n <b>{ads_text}</b> \n━━━━━━━━━━━━━━━━━━"
-        if ads_text
-        else ""
-    )
-    links = ""
-    if settings["link"]:
-        btn = []
-        for file_num, file in enumerate(files, start=offset + 1):
-            links += f"""<b>\n\n{file_num}. <a href=https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{file.file_id}>[{get_size(file.file_size)}] {' '.join(filter(lambda x: not x.startswith('[') and not x.startswith('@') and not x.startswith('www.'), file.file_name.split()))}</a></b>"""
-    else:
-        btn = [
-            [
-                InlineKeyboardButton(
-                    text=f"🔗 {get_size(file.file_size)}≽ {formate_file_name(file.file_name)}",
-                    callback_data=f"cfiles#{reqnxt}#{file.file_id}",
-                ),
-            ]
-            for file in files
-        ]
-
-    btn.insert(
-        0,
-        [
-            InlineKeyboardButton(
-                "📥 sᴇɴᴅ ᴀʟʟ ғɪʟᴇs 📥", callback_data=f"send_all#{key}"
-            ),
-        ],
-    )
-    btn.insert(
-        1,
-        [
-            InlineKeyboardButton(
-                "ǫᴜᴀʟɪᴛʏ ", callback_data=f"qualities#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ꜱᴇᴀꜱᴏɴ", callback_data=f"seasons#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ʟᴀɴɢᴜᴀɢᴇ ", callback_data=f"languages#{key}#{offset}#{req}"
-            ),
-        ],
-    )
-
-    if n_offset == "":
-        btn.append(
-            [InlineKeyboardButton(text="🚸 ɴᴏ ᴍᴏʀᴇ ᴘᴀɢᴇs 🚸", callback_data="buttons")]
-        )
-    elif n_offset == 0:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"years_search#{year}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-            ]
-        )
-    elif offset == 0:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-                InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟",
-                    callback_data=f"years_search#{year}#{key}#{n_offset}#{orginal_offset}#{req}",
-                ),
-            ]
-        )
-    else:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"years_search#{year}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-                InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟",
-                    callback_data=f"years_search#{year}#{key}#{n_offset}#{orginal_offset}#{req}",
-                ),
-            ]
-        )
-
-    btn.append(
-        [
-            InlineKeyboardButton(
-                text="⋞ ʙᴀᴄᴋ ᴛᴏ ᴍᴀɪɴ ᴘᴀɢᴇ",
-                callback_data=f"next_{req}_{key}_{orginal_offset}",
-            ),
-        ]
-    )
-    await query.message.edit_text(
-        cap + links + js_ads,
-        disable_web_page_preview=True,
-        parse_mode=enums.ParseMode.HTML,
-        reply_markup=InlineKeyboardMarkup(btn),
-    )
-    return
-
-
-@Client.on_callback_query(filters.regex(r"^qualities#"))
-async def quality_cb_handler(client: Client, query: CallbackQuery):
-    _, key, offset, req = query.data.split("#")
-    if int(req) != query.from_user.id:
-        return await query.answer(script.ALRT_TXT, show_alert=True)
-    btn = []
-    for i in range(0, len(QUALITIES) - 1, 2):
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    text=QUALITIES[i].title(),
-                    callback_data=f"quality_search#{QUALITIES[i].lower()}#{key}#0#{offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    text=QUALITIES[i + 1].title(),
-                    callback_data=f"quality_search#{QUALITIES[i+1].lower()}#{key}#0#{offset}#{req}",
-                ),
-            ]
-        )
-    btn.append(
+@Client.on_callback_query(filters.regex("admincmd"))
+async def admin_commands(client, query):
+    if query.from_user.id not in ADMINS:
+        return await query.answer("ᴛʜɪꜱ ɪꜱ ɴᴏᴛ ꜰᴏʀ ʏᴏᴜ ʙʀᴏ!", show_alert=True)
+
+    buttons = [
         [
-            InlineKeyboardButton(
-                text="⋞ ʙᴀᴄᴋ ᴛᴏ ᴍᴀɪɴ ᴘᴀɢᴇ", callback_data=f"next_{req}_{key}_{offset}"
-            )
+            InlineKeyboardButton("⋞ ʙᴀᴄᴋ", callback_data="help"),
         ]
+    ]
+    reply_markup = InlineKeyboardMarkup(buttons)
+
+    await client.edit_message_media(
+        chat_id=query.message.chat.id,
+        message_id=query.message.id,
+        media=InputMediaAnimation(
+            media="https://cdn.jsdelivr.net/gh/Jisshubot/JISSHU_BOTS/Video.mp4/Welcome_video_20240921_184741_0001.gif",
+            caption=script.ADMIN_CMD_TXT,
+            parse_mode=enums.ParseMode.HTML,
+        ),
+        reply_markup=reply_markup,
     )
-    await query.message.edit_text(
-        "<b>ɪɴ ᴡʜɪᴄʜ ǫᴜᴀʟɪᴛʏ ᴅᴏ ʏᴏᴜ ᴡᴀɴᴛ, ᴄʜᴏᴏsᴇ ғʀᴏᴍ ʜᴇʀᴇ ↓↓</b>",
-        reply_markup=InlineKeyboardMarkup(btn),
-    )
-    return
 
 
-@Client.on_callback_query(filters.regex(r"^quality_search#"))
-async def quality_search(client: Client, query: CallbackQuery):
-    _, qul, key, offset, orginal_offset, req = query.data.split("#")
-    if int(req) != query.from_user.id:
-        return await query.answer(script.ALRT_TXT, show_alert=True)
-    offset = int(offset)
-    search = BUTTONS.get(key)
-    cap = CAP.get(key)
+@Client.on_callback_query(filters.regex(r"^next"))
+async def next_page(bot, query):
+    ident, req, key, offset = query.data.split("_")
+    if int(req) not in [query.from_user.id, 0]:
+        return await query.answer(
+            script.ALRT_TXT.format(query.from_user.first_name), show_alert=True
+        )
+    try:
+        offset = int(offset)
+    except:
+        offset = 0
+    search = await sessions.get("query", key)
+    cap = await sessions.get("cap", key)
     if not search:
         await query.answer(
             script.OLD_ALRT_TXT.format(query.from_user.first_name), show_alert=True
         )
         return
-    search = search.replace("_", " ")
+    await sessions.pop("filters", key)
     files, n_offset, total = await get_search_results(
-        f"{search} {qul}", max_results=int(MAX_BTN), offset=offset
+        search, offset=offset, session=key
     )
     try:
         n_offset = int(n_offset)
     except:
         n_offset = 0
-    files = [file for file in files if re.search(qul, file.file_name, re.IGNORECASE)]
     if not files:
-        await query.answer(
-            f"sᴏʀʀʏ ǫᴜᴀʟɪᴛʏ {qul.title()} ɴᴏᴛ ғᴏᴜɴᴅ ғᴏʀ {search}", show_alert=1
-        )
         return
-
-    temp.FILES_ID[key] = files
-    reqnxt = query.from_user.id if query.from_user else 0
-    settings = await get_settings(query.message.chat.id)
-    temp.CHAT[query.from_user.id] = query.message.chat.id
+    await sessions.set("files", key, [file.file_id for file in files])
     ads, ads_name, _ = await mdb.get_advirtisment()
     ads_text = ""
     if ads is not None and ads_name is not None:
@@ -843,71 +292,41 @@ async def quality_search(client: Client, query: CallbackQuery):
         if ads_text
         else ""
     )
-    links = ""
-    if settings["link"]:
-        btn = []
-        for file_num, file in enumerate(files, start=offset + 1):
-            links += f"""<b>\n\n{file_num}. <a href=https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{file.file_id}>[{get_size(file.file_size)}] {' '.join(filter(lambda x: not x.startswith('[') and not x.startswith('@') and not x.startswith('www.'), file.file_name.split()))}</a></b>"""
+    settings = await get_settings(query.message.chat.id)
+    await sessions.set("chat", query.from_user.id, query.message.chat.id)
+    btn, links = result_rows(
+        files, query.message.chat.id, settings["link"], offset + 1, "📁"
+    )
+    btn[:0] = filter_rows(key, offset, req)
+
+    if 0 < offset <= int(MAX_BTN):
+        off_set = 0
+    elif offset == 0:
+        off_set = None
     else:
-        btn = [
-            [
-                InlineKeyboardButton(
-                    text=f"🔗 {get_size(file.file_size)}≽ {formate_file_name(file.file_name)}",
-                    callback_data=f"cfiles#{reqnxt}#{file.file_id}",
-                ),
-            ]
-            for file in files
-        ]
+        off_set = offset - int(MAX_BTN)
+    if n_offset == 0:
 
-    btn.insert(
-        0,
-        [
-            InlineKeyboardButton(
-                "📥 sᴇɴᴅ ᴀʟʟ ғɪʟᴇs 📥", callback_data=f"send_all#{key}"
-            ),
-        ],
-    )
-    btn.insert(
-        1,
-        [
-            InlineKeyboardButton(
-                "ǫᴜᴀʟɪᴛʏ", callback_data=f"qualities#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ꜱᴇᴀꜱᴏɴ", callback_data=f"seasons#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ʟᴀɴɢᴜᴀɢᴇ", callback_data=f"languages#{key}#{offset}#{req}"
-            ),
-        ],
-    )
-    if n_offset == "":
-        btn.append(
-            [InlineKeyboardButton(text="🚸 ɴᴏ ᴍᴏʀᴇ ᴘᴀɢᴇs 🚸", callback_data="buttons")]
-        )
-    elif n_offset == 0:
         btn.append(
             [
                 InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"quality_search#{qul}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
+                    "⋞ ʙᴀᴄᴋ", callback_data=f"next_{req}_{key}_{off_set}"
                 ),
                 InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
+                    f"ᴘᴀɢᴇ {math.ceil(int(offset) / int(MAX_BTN)) + 1} / {math.ceil(total / int(MAX_BTN))}",
                     callback_data="pages",
                 ),
             ]
         )
-    elif offset == 0:
+    elif off_set is None:
         btn.append(
             [
                 InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
+                    f"{math.ceil(int(offset) / int(MAX_BTN)) + 1} / {math.ceil(total / int(MAX_BTN))}",
                     callback_data="pages",
                 ),
                 InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟",
-                    callback_data=f"quality_search#{qul}#{key}#{n_offset}#{orginal_offset}#{req}",
+                    "ɴᴇxᴛ ⋟", callback_data=f"next_{req}_{key}_{n_offset}"
                 ),
             ]
         )
@@ -915,57 +334,109 @@ async def quality_search(client: Client, query: CallbackQuery):
         btn.append(
             [
                 InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"quality_search#{qul}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
+                    "⋞ ʙᴀᴄᴋ", callback_data=f"next_{req}_{key}_{off_set}"
                 ),
                 InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
+                    f"{math.ceil(int(offset) / int(MAX_BTN)) + 1} / {math.ceil(total / int(MAX_BTN))}",
                     callback_data="pages",
                 ),
                 InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟",
-                    callback_data=f"quality_search#{qul}#{key}#{n_offset}#{orginal_offset}#{req}",
+                    "ɴᴇxᴛ ⋟", callback_data=f"next_{req}_{key}_{n_offset}"
                 ),
-            ]
+            ],
+        )
+    if settings["link"]:
+        await query.message.edit_text(
+            cap + links + js_ads,
+            disable_web_page_preview=True,
+            parse_mode=enums.ParseMode.HTML,
+            reply_markup=InlineKeyboardMarkup(btn),
         )
+        return
+    try:
+        await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(btn))
+    except MessageNotModified:
+        pass
+    await query.answer()
 
-    btn.append(
+
+def filter_rows(key, offset, req):
+    """Send-all and filter menu rows shown above the results"""
+    return [
+        [InlineKeyboardButton("📥 sᴇɴᴅ ᴀʟʟ ғɪʟᴇs 📥", callback_data=f"send_all#{key}")],
         [
             InlineKeyboardButton(
-                text="⋞ ʙᴀᴄᴋ ᴛᴏ ᴍᴀɪɴ ᴘᴀɢᴇ",
-                callback_data=f"next_{req}_{key}_{orginal_offset}",
+                "ǫᴜᴀʟɪᴛʏ ", callback_data=f"qualities#{key}#{offset}#{req}"
             ),
-        ]
-    )
-    await query.message.edit_text(
-        cap + links + js_ads,
-        disable_web_page_preview=True,
-        parse_mode=enums.ParseMode.HTML,
-        reply_markup=InlineKeyboardMarkup(btn),
-    )
-    return
-    await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(btn))
+            InlineKeyboardButton(
+                "ꜱᴇᴀꜱᴏɴ", callback_data=f"seasons#{key}#{offset}#{req}"
+            ),
+            InlineKeyboardButton(
+                "ʟᴀɴɢᴜᴀɢᴇ ", callback_data=f"languages#{key}#{offset}#{req}"
+            ),
+        ],
+    ]
 
 
-@Client.on_callback_query(filters.regex(r"^languages#"))
-async def languages_cb_handler(client: Client, query: CallbackQuery):
-    _, key, offset, req = query.data.split("#")
+# callback prefix -> (facet field, value parser, label used in "not found")
+FACET_CALLBACKS = {
+    "season_search": ("season", lambda v: int(v.split(" ", 1)[1]), ""),
+    "years_search": ("year", int, "ʏᴇᴀʀ "),
+    "quality_search": ("quality", quality_key, "ǫᴜᴀʟɪᴛʏ "),
+    "lang_search": ("languages", str, "ʟᴀɴɢᴜᴀɢᴇ "),
+}
+# menu prefix -> (filter callback prefix, options, menu label)
+FACET_MENUS = {
+    "seasons": ("season_search", SEASONS, "sᴇᴀsᴏɴ"),
+    "years": ("years_search", YEARS, "ʏᴇᴀʀ"),
+    "qualities": ("quality_search", QUALITIES, "ǫᴜᴀʟɪᴛʏ"),
+    "languages": ("lang_search", LANGUAGES, "ʟᴀɴɢᴜᴀɢᴇ"),
+}
+
+
+@Client.on_callback_query(filters.regex(r"^(seasons|years|qualities|languages)#"))
+async def filter_menu(client: Client, query: CallbackQuery):
+    """Season/year/quality/language menu listing only options with results"""
+    prefix, key, offset, req = query.data.split("#")
     if int(req) != query.from_user.id:
         return await query.answer(script.ALRT_TXT, show_alert=True)
-    btn = []
-    for i in range(0, len(LANGUAGES) - 1, 2):
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    text=LANGUAGES[i].title(),
-                    callback_data=f"lang_search#{LANGUAGES[i].lower()}#{key}#0#{offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    text=LANGUAGES[i + 1].title(),
-                    callback_data=f"lang_search#{LANGUAGES[i+1].lower()}#{key}#0#{offset}#{req}",
+    search = await sessions.get("query", key)
+    if not search:
+        await query.answer(
+            script.OLD_ALRT_TXT.format(query.from_user.first_name), show_alert=True
+        )
+        return
+    search = search.replace("_", " ")
+    search_prefix, options, label = FACET_MENUS[prefix]
+    field, parse, _ = FACET_CALLBACKS[search_prefix]
+    facets = await sessions.get("filters", key, {})
+    facets = {f: v for f, v in facets.items() if f != field}
+    counts = await get_facet_counts(search, facets=facets)
+    # None when the matches were too many to count, offer every option then
+    if counts is not None:
+        counts = counts[field]
+    buttons = []
+    seen = set()
+    for option in options:
+        value = parse(option.lower())
+        if value in seen or (counts is not None and not counts.get(value)):
+            continue
+        seen.add(value)
+        buttons.append(
+            InlineKeyboardButton(
+                text=(
+                    f"{option.title()} ({counts[value]})"
+                    if counts is not None
+                    else option.title()
                 ),
-            ]
+                callback_data=f"{search_prefix}#{option.lower()}#{key}#0#{offset}#{req}",
+            )
         )
+    if not buttons:
+        return await query.answer(
+            f"sᴏʀʀʏ ɴᴏ {label} ғᴏᴜɴᴅ ғᴏʀ {search}", show_alert=True
+        )
+    btn = [buttons[i : i + 2] for i in range(0, len(buttons), 2)]
     btn.append(
         [
             InlineKeyboardButton(
@@ -974,152 +445,91 @@ async def languages_cb_handler(client: Client, query: CallbackQuery):
         ]
     )
     await query.message.edit_text(
-        "<b>ɪɴ ᴡʜɪᴄʜ ʟᴀɴɢᴜᴀɢᴇ ᴅᴏ ʏᴏᴜ ᴡᴀɴᴛ, ᴄʜᴏᴏsᴇ ғʀᴏᴍ ʜᴇʀᴇ ↓↓</b>",
+        f"<b>ɪɴ ᴡʜɪᴄʜ {label} ᴅᴏ ʏᴏᴜ ᴡᴀɴᴛ, ᴄʜᴏᴏsᴇ ғʀᴏᴍ ʜᴇʀᴇ ↓↓</b>",
         reply_markup=InlineKeyboardMarkup(btn),
     )
     return
 
 
-@Client.on_callback_query(filters.regex(r"^lang_search#"))
-async def lang_search(client: Client, query: CallbackQuery):
-    _, lang, key, offset, orginal_offset, req = query.data.split("#")
-    lang2 = lang[:3]
+@Client.on_callback_query(
+    filters.regex(r"^(season_search|years_search|quality_search|lang_search)#")
+)
+async def filter_search(client: Client, query: CallbackQuery):
+    """One handler for every season/year/quality/language filter button.
+
+    Picked filters accumulate per search in the session store, so e.g. a season and a
+    quality can be combined. Every page is a single faceted query.
+    """
+    prefix, value, key, offset, orginal_offset, req = query.data.split("#")
     if int(req) != query.from_user.id:
         return await query.answer(script.ALRT_TXT, show_alert=True)
     offset = int(offset)
-    search = BUTTONS.get(key)
-    cap = CAP.get(key)
+    search = await sessions.get("query", key)
+    cap = await sessions.get("cap", key)
     if not search:
         await query.answer(
             script.OLD_ALRT_TXT.format(query.from_user.first_name), show_alert=True
         )
         return
     search = search.replace("_", " ")
+    field, parse, label = FACET_CALLBACKS[prefix]
+    facets = dict(await sessions.get("filters", key, {}), **{field: parse(value)})
     files, n_offset, total = await get_search_results(
-        f"{search} {lang}", max_results=int(MAX_BTN), offset=offset
+        search, max_results=int(MAX_BTN), offset=offset, facets=facets, session=key
     )
-    files2, n_offset2, total2 = await get_search_results(
-        f"{search} {lang2}", max_results=int(MAX_BTN), offset=offset
-    )
-    total += total2
-    try:
-        n_offset = int(n_offset)
-    except:
-        try:
-            n_offset = int(n_offset2)
-        except:
-            n_offset = 0
-    files = [file for file in files if re.search(lang, file.file_name, re.IGNORECASE)]
     if not files:
-        files = [
-            file for file in files2 if re.search(lang2, file.file_name, re.IGNORECASE)
-        ]
-        if not files:
-            return await query.answer(
-                f"sᴏʀʀʏ ʟᴀɴɢᴜᴀɢᴇ {lang.title()} ɴᴏᴛ ғᴏᴜɴᴅ ғᴏʀ {search}", show_alert=1
-            )
+        await query.answer(
+            f"sᴏʀʀʏ {label}{value.title()} ɴᴏᴛ ғᴏᴜɴᴅ ғᴏʀ {search}", show_alert=1
+        )
+        return
+    await sessions.set("filters", key, facets)
 
-    temp.FILES_ID[key] = files
+    await sessions.set("files", key, [file.file_id for file in files])
     reqnxt = query.from_user.id if query.from_user else 0
     settings = await get_settings(query.message.chat.id)
-    group_id = query.message.chat.id
-    temp.CHAT[query.from_user.id] = query.message.chat.id
+    await sessions.set("chat", query.from_user.id, query.message.chat.id)
     ads, ads_name, _ = await mdb.get_advirtisment()
     ads_text = ""
     if ads is not None and ads_name is not None:
         ads_url = f"https://telegram.dog/{temp.U_NAME}?start=ads"
         ads_text = f"<a href={ads_url}>{ads_name}</a>"
-
     js_ads = (
         f"\n━━━━━━━━━━━━━━━━━━\n <b>{ads_text}</b> \n━━━━━━━━━━━━━━━━━━"
         if ads_text
         else ""
     )
-    links = ""
-    if settings["link"]:
-        btn = []
-        for file_num, file in enumerate(files, start=offset + 1):
-            links += f"""<b>\n\n{file_num}. <a href=https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{file.file_id}>[{get_size(file.file_size)}] {' '.join(filter(lambda x: not x.startswith('[') and not x.startswith('@') and not x.startswith('www.'), file.file_name.split()))}</a></b>"""
-    else:
-        btn = [
-            [
-                InlineKeyboardButton(
-                    text=f"🔗 {get_size(file.file_size)}≽ {formate_file_name(file.file_name)}",
-                    callback_data=f"cfiles#{reqnxt}#{file.file_id}",
-                ),
-            ]
-            for file in files
-        ]
-
-    btn.insert(
-        0,
-        [
-            InlineKeyboardButton(
-                "📥 sᴇɴᴅ ᴀʟʟ ғɪʟᴇs 📥", callback_data=f"send_all#{key}"
-            ),
-        ],
-    )
-    btn.insert(
-        1,
-        [
-            InlineKeyboardButton(
-                "ǫᴜᴀʟɪᴛʏ", callback_data=f"qualities#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ꜱᴇᴀꜱᴏɴ", callback_data=f"seasons#{key}#{offset}#{req}"
-            ),
-            InlineKeyboardButton(
-                "ʟᴀɴɢᴜᴀɢᴇ", callback_data=f"languages#{key}#{offset}#{req}"
-            ),
-        ],
+    btn, links = result_rows(
+        files, query.message.chat.id, settings["link"], offset + 1, req=reqnxt
     )
-    if n_offset == "":
+    btn[:0] = filter_rows(key, orginal_offset, req)
+
+    if offset == 0 and n_offset == "":
         btn.append(
             [InlineKeyboardButton(text="🚸 ɴᴏ ᴍᴏʀᴇ ᴘᴀɢᴇs 🚸", callback_data="buttons")]
         )
-    elif n_offset == 0:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"lang_search#{lang}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-            ]
-        )
-    elif offset == 0:
-        btn.append(
-            [
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
-                InlineKeyboardButton(
-                    "ɴᴇxᴛ ⋟",
-                    callback_data=f"lang_search#{lang}#{key}#{n_offset}#{orginal_offset}#{req}",
-                ),
-            ]
-        )
     else:
-        btn.append(
-            [
+        nav = []
+        if offset > 0:
+            nav.append(
                 InlineKeyboardButton(
                     "⋞ ʙᴀᴄᴋ",
-                    callback_data=f"lang_search#{lang}#{key}#{offset- int(MAX_BTN)}#{orginal_offset}#{req}",
-                ),
-                InlineKeyboardButton(
-                    f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
-                    callback_data="pages",
-                ),
+                    callback_data=f"{prefix}#{value}#{key}#{max(offset - int(MAX_BTN), 0)}#{orginal_offset}#{req}",
+                )
+            )
+        nav.append(
+            InlineKeyboardButton(
+                f"{math.ceil(offset / int(MAX_BTN)) + 1}/{math.ceil(total / int(MAX_BTN))}",
+                callback_data="pages",
+            )
+        )
+        if n_offset != "":
+            nav.append(
                 InlineKeyboardButton(
                     "ɴᴇxᴛ ⋟",
-                    callback_data=f"lang_search#{lang}#{key}#{n_offset}#{orginal_offset}#{req}",
-                ),
-            ]
-        )
+                    callback_data=f"{prefix}#{value}#{key}#{n_offset}#{orginal_offset}#{req}",
+                )
+            )
+        btn.append(nav)
 
     btn.append(
         [
@@ -1136,7 +546,6 @@ async def lang_search(client: Client, query: CallbackQuery):
         reply_markup=InlineKeyboardMarkup(btn),
     )
     return
-    await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(btn))
 
 
 @Client.on_callback_query(filters.regex(r"^spol"))
@@ -1168,9 +577,7 @@ async def pmfile_cb(client, query):
         await query.answer("Please Request Your Own!!", show_alert=True)
         return
 
-    await query.answer(
-        f"https://telegram.dog/{temp.U_NAME}?start=file_{query.message.chat.id}_{fileid}"
-    )
+    await query.answer(file_link(query.message.chat.id, fileid))
     return
 
 
@@ -1214,7 +621,7 @@ async def cb_handler(client: Client, query: CallbackQuery):
         user = query.message.reply_to_message.from_user.id
         if int(user) != 0 and query.from_user.id != int(user):
             return await query.answer(script.ALRT_TXT, show_alert=True)
-        files = temp.FILES_ID.get(key)
+        files = await sessions.get("files", key)
         if not files:
             await query.answer(
                 script.OLD_ALRT_TXT.format(query.from_user.first_name), show_alert=True
@@ -1602,7 +1009,7 @@ async def cb_handler(client: Client, query: CallbackQuery):
     elif query.data == "all_files_delete":
         files = await Media.count_documents()
         await query.answer("Deleting...")
-        await Media.collection.drop()
+        await delete_all_files()
         await query.message.edit_text(f"Successfully deleted {files} files")
 
     elif query.data.startswith("killfilesak"):
@@ -1620,12 +1027,12 @@ async def cb_handler(client: Client, query: CallbackQuery):
                 for file in files:
                     file_ids = file.file_id
                     file_name = file.file_name
-                    result = await Media.collection.delete_one(
+                    deleted_count = await delete_files(
                         {
                             "_id": file_ids,
                         }
                     )
-                    if result.deleted_count:
+                    if deleted_count:
                         print(f"Successfully deleted {file_name} from database.")
                     deleted += 1
                     if deleted % 20 == 0:
@@ -1644,21 +1051,26 @@ async def cb_handler(client: Client, query: CallbackQuery):
         grp_id = query.message.chat.id
         btn = [[InlineKeyboardButton("☕️ ᴄʟᴏsᴇ ☕️", callback_data="close_data")]]
         reply_markup = InlineKeyboardMarkup(btn)
-        await save_group_settings(grp_id, "shortner", SHORTENER_WEBSITE)
-        await save_group_settings(grp_id, "api", SHORTENER_API)
-        await save_group_settings(grp_id, "shortner_two", SHORTENER_WEBSITE2)
-        await save_group_settings(grp_id, "api_two", SHORTENER_API2)
-        await save_group_settings(grp_id, "shortner_three", SHORTENER_WEBSITE3)
-        await save_group_settings(grp_id, "api_three", SHORTENER_API3)
-        await save_group_settings(grp_id, "verify_time", TWO_VERIFY_GAP)
-        await save_group_settings(grp_id, "third_verify_time", THREE_VERIFY_GAP)
-        await save_group_settings(grp_id, "tutorial", TUTORIAL)
-        await save_group_settings(grp_id, "tutorial_2", TUTORIAL_2)
-        await save_group_settings(grp_id, "tutorial_3", TUTORIAL_3)
-        await save_group_settings(grp_id, "template", IMDB_TEMPLATE)
-        await save_group_settings(grp_id, "caption", FILE_CAPTION)
-        await save_group_settings(grp_id, "fsub_id", AUTH_CHANNEL)
-        await save_group_settings(grp_id, "log", LOG_VR_CHANNEL)
+        await update_group_settings(
+            grp_id,
+            {
+                "shortner": SHORTENER_WEBSITE,
+                "api": SHORTENER_API,
+                "shortner_two": SHORTENER_WEBSITE2,
+                "api_two": SHORTENER_API2,
+                "shortner_three": SHORTENER_WEBSITE3,
+                "api_three": SHORTENER_API3,
+                "verify_time": TWO_VERIFY_GAP,
+                "third_verify_time": THREE_VERIFY_GAP,
+                "tutorial": TUTORIAL,
+                "tutorial_2": TUTORIAL_2,
+                "tutorial_3": TUTORIAL_3,
+                "template": IMDB_TEMPLATE,
+                "caption": FILE_CAPTION,
+                "fsub_id": AUTH_CHANNEL,
+                "log": LOG_VR_CHANNEL,
+            },
+        )
         await query.answer("ꜱᴜᴄᴄᴇꜱꜱғᴜʟʟʏ ʀᴇꜱᴇᴛ...")
         await query.message.edit_text(
             "<b>ꜱᴜᴄᴄᴇꜱꜱғᴜʟʟʏ ʀᴇꜱᴇᴛ ɢʀᴏᴜᴘ ꜱᴇᴛᴛɪɴɢꜱ...\n\nɴᴏᴡ ꜱᴇɴᴅ /details ᴀɢᴀɪɴ</b>",
@@ -2111,37 +1523,34 @@ async def cb_handler(client: Client, query: CallbackQuery):
 
 
 async def ai_spell_check(wrong_name):
-    async def search_movie(wrong_name):
-        search_results = imdb.search_movie(wrong_name)
-        movie_list = [movie["title"] for movie in search_results]
-        return movie_list
-
-    movie_list = await search_movie(wrong_name)
-    if not movie_list:
-        return
-    for _ in range(5):
-        closest_match = process.extractOne(wrong_name, movie_list)
-        if not closest_match or closest_match[1] <= 80:
+    """Closest title we actually have files for, from the local trigram index"""
+    wrong_name = " ".join(tokenize(wrong_name))
+    for title, score in suggest_titles(wrong_name):
+        if score < SPELL_CHECK_SCORE:
             return
-        movie = closest_match[0]
-        files, offset, total_results = await get_search_results(movie)
+        if title == wrong_name:
+            continue
+        # the title comes from indexed file names, but the search built from
+        # it does not always match them
+        files, offset, total_results = await get_search_results(title)
         if files:
-            return movie
-        movie_list.remove(movie)
+            return title
     return
 
 
-async def auto_filter(client, msg, spoll=False, pm_mode=False):
+async def auto_filter(client, msg, spoll=False, pm_mode=False, spell_checked=False):
     if not spoll:
         message = msg
         search = message.text
         chat_id = message.chat.id
         settings = await get_settings(chat_id)
         searching_msg = await msg.reply_text(f"🔎 sᴇᴀʀᴄʜɪɴɢ {search}")
-        files, offset, total_results = await get_search_results(search)
+        files, offset, total_results = await get_search_results(
+            search, session=f"{chat_id}-{message.id}"
+        )
         await searching_msg.delete()
         if not files:
-            if settings["spell_check"]:
+            if settings["spell_check"] and not spell_checked:
                 ai_sts = await msg.reply_text("ᴄʜᴇᴄᴋɪɴɢ ʏᴏᴜʀ sᴘᴇʟʟɪɴɢ...")
                 is_misspelled = await ai_spell_check(search)
                 if is_misspelled:
@@ -2149,7 +1558,7 @@ async def auto_filter(client, msg, spoll=False, pm_mode=False):
                     await asyncio.sleep(2)
                     msg.text = is_misspelled
                     await ai_sts.delete()
-                    return await auto_filter(client, msg)
+                    return await auto_filter(client, msg, spell_checked=True)
                 await ai_sts.delete()
                 return await advantage_spell_chok(msg)
             return
@@ -2159,55 +1568,18 @@ async def auto_filter(client, msg, spoll=False, pm_mode=False):
         search, files, offset, total_results = spoll
     req = message.from_user.id if message.from_user else 0
     key = f"{message.chat.id}-{message.id}"
-    batch_ids = files
-    temp.FILES_ID[f"{message.chat.id}-{message.id}"] = batch_ids
+    await sessions.set("files", key, [file.file_id for file in files])
     batch_link = f"batchfiles#{message.chat.id}#{message.id}#{message.from_user.id}"
-    temp.CHAT[message.from_user.id] = message.chat.id
-    settings = await get_settings(message.chat.id)
+    await sessions.set("chat", message.from_user.id, message.chat.id)
     del_msg = (
         f"\n\n<b>⚠️ ᴛʜɪs ᴍᴇssᴀɢᴇ ᴡɪʟʟ ʙᴇ ᴀᴜᴛᴏ ᴅᴇʟᴇᴛᴇ ᴀꜰᴛᴇʀ <code>{get_readable_time(DELETE_TIME)}</code> ᴛᴏ ᴀᴠᴏɪᴅ ᴄᴏᴘʏʀɪɢʜᴛ ɪssᴜᴇs</b>"
         if settings["auto_delete"]
         else ""
     )
-    links = ""
-    if settings["link"]:
-        btn = []
-        for file_num, file in enumerate(files, start=1):
-            links += f"""<b>\n\n{file_num}. <a href=https://telegram.dog/{temp.U_NAME}?start=file_{message.chat.id}_{file.file_id}>[{get_size(file.file_size)}] {formate_file_name(file.file_name)}</a></b>"""
-    else:
-        btn = [
-            [
-                InlineKeyboardButton(
-                    text=f"🔗 {get_size(file.file_size)}≽ {formate_file_name(file.file_name)}",
-                    url=f"https://telegram.dog/{temp.U_NAME}?start=file_{message.chat.id}_{file.file_id}",
-                ),
-            ]
-            for file in files
-        ]
+    btn, links = result_rows(files, message.chat.id, settings["link"])
     if offset != "":
         if total_results >= MAX_BTN:
-            btn.insert(
-                0,
-                [
-                    InlineKeyboardButton(
-                        "📥 sᴇɴᴅ ᴀʟʟ ғɪʟᴇs 📥", callback_data=f"send_all#{key}"
-                    ),
-                ],
-            )
-            btn.insert(
-                1,
-                [
-                    InlineKeyboardButton(
-                        "ǫᴜᴀʟɪᴛʏ ", callback_data=f"qualities#{key}#{offset}#{req}"
-                    ),
-                    InlineKeyboardButton(
-                        "ꜱᴇᴀꜱᴏɴ", callback_data=f"seasons#{key}#{offset}#{req}"
-                    ),
-                    InlineKeyboardButton(
-                        "ʟᴀɴɢᴜᴀɢᴇ ", callback_data=f"languages#{key}#{offset}#{req}"
-                    ),
-                ],
-            )
+            btn[:0] = filter_rows(key, offset, req)
         else:
             btn.insert(
                 0,
@@ -2242,7 +1614,7 @@ async def auto_filter(client, msg, spoll=False, pm_mode=False):
         await asyncio.sleep(1.2)
         await m.delete()
     if offset != "":
-        BUTTONS[key] = search
+        await sessions.set("query", key, search)
         req = message.from_user.id if message.from_user else 0
         btn.append(
             [
@@ -2256,7 +1628,7 @@ async def auto_filter(client, msg, spoll=False, pm_mode=False):
             ]
         )
         key = f"{message.chat.id}-{message.id}"
-        BUTTONS[key] = search
+        await sessions.set("query", key, search)
         req = message.from_user.id if message.from_user else 0
         try:
             offset = int(offset)
@@ -2268,40 +1640,22 @@ async def auto_filter(client, msg, spoll=False, pm_mode=False):
         if settings["imdb"]
         else None
     )
-    TEMPLATE = settings["template"]
+    cap = None
     if imdb:
-        cap = TEMPLATE.format(
-            query=search,
-            title=imdb["title"],
-            votes=imdb["votes"],
-            aka=imdb["aka"],
-            seasons=imdb["seasons"],
-            box_office=imdb["box_office"],
-            localized_title=imdb["localized_title"],
-            kind=imdb["kind"],
-            imdb_id=imdb["imdb_id"],
-            cast=imdb["cast"],
-            runtime=imdb["runtime"],
-            countries=imdb["countries"],
-            certificates=imdb["certificates"],
-            languages=imdb["languages"],
-            director=imdb["director"],
-            writer=imdb["writer"],
-            producer=imdb["producer"],
-            composer=imdb["composer"],
-            cinematographer=imdb["cinematographer"],
-            music_team=imdb["music_team"],
-            distributors=imdb["distributors"],
-            release_date=imdb["release_date"],
-            year=imdb["year"],
-            genres=imdb["genres"],
-            poster=imdb["poster"],
-            plot=imdb["plot"],
-            rating=imdb["rating"],
-            url=imdb["url"],
-            **locals(),
+        values = ChainMap(
+            {
+                "query": search,
+                "search": search,
+                "message": message,
+                "total_results": total_results,
+            },
+            imdb,
         )
-    else:
+        try:
+            cap = render_template(settings["template"], IMDB_FIELDS, values)
+        except TemplateError as e:
+            logger.error(f"Bad template in {message.chat.id}: {e}")
+    if not cap:
         cap = f"<b>📂 ʜᴇʀᴇ ɪ ꜰᴏᴜɴᴅ ꜰᴏʀ ʏᴏᴜʀ sᴇᴀʀᴄʜ {search}</b>"
 
     ads, ads_name, _ = await mdb.get_advirtisment()
@@ -2314,7 +1668,7 @@ async def auto_filter(client, msg, spoll=False, pm_mode=False):
         if ads_text
         else ""
     )
-    CAP[key] = cap
+    await sessions.set("cap", key, cap)
     if imdb and imdb.get("poster"):
         try:
             if settings["auto_delete"]:
@@ -2412,13 +1766,6 @@ async def advantage_spell_chok(message):
     search = message.text
     chat_id = message.chat.id
     settings = await get_settings(chat_id)
-    query = re.sub(
-        r"\b(pl(i|e)*?(s|z+|ease|se|ese|(e+)s(e)?)|((send|snd|giv(e)?|gib)(\sme)?)|movie(s)?|new|latest|br((o|u)h?)*|^h(e|a)?(l)*(o)*|mal(ayalam)?|t(h)?amil|file|that|find|und(o)*|kit(t(i|y)?)?o(w)?|thar(u)?(o)*w?|kittum(o)*|aya(k)*(um(o)*)?|full\smovie|any(one)|with\ssubtitle(s)?)",
-        "",
-        message.text,
-        flags=re.IGNORECASE,
-    )
-    query = query.strip() + " movie"
     try:
         movies = await get_poster(search, bulk=True)
     except:
@@ -2455,7 +1802,8 @@ async def advantage_spell_chok(message):
     buttons = [
         [
             InlineKeyboardButton(
-                text=movie.get("title"), callback_data=f"spol#{movie.movieID}#{user}"
+                text=movie.get("title"),
+                callback_data=f"spol#{movie['movieID']}#{user}",
             )
         ]
         for movie in movies
@@ -0,0 +1,30 @@
+from pyrogram import Client
+from info import WORKER_ID, WORKER_COUNT
+
+# With WORKER_COUNT > 1 every worker process receives every update, these
+# handlers run first (group -100) and stop the ones owned by another worker.
+# Updates are split by chat so a chat always lands on the same worker, the
+# search state itself is shared through the session store.
+
+
+def other_worker(chat_id):
+    return chat_id % WORKER_COUNT != WORKER_ID
+
+
+if WORKER_COUNT > 1:
+
+    @Client.on_message(group=-100)
+    async def shard_messages(client, message):
+        if message.chat and other_worker(message.chat.id):
+            message.stop_propagation()
+
+    @Client.on_callback_query(group=-100)
+    async def shard_callbacks(client, query):
+        chat_id = query.message.chat.id if query.message else query.from_user.id
+        if other_worker(chat_id):
+            query.stop_propagation()
+
+    @Client.on_chat_join_request(group=-100)
+    async def shard_join_requests(client, request):
+        if other_worker(request.from_user.id):
+            request.stop_propagation()
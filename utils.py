@@ -6,10 +6,26 @@ from pyrogram.errors import (
     UserIsBlocked,
     PeerIdInvalid,
 )
-from info import AUTH_CHANNEL, LONG_IMDB_DESCRIPTION, START_IMG
+from info import (
+    AUTH_CHANNEL,
+    LONG_IMDB_DESCRIPTION,
+    START_IMG,
+    IMDB_CONCURRENCY,
+    IMDB_TIMEOUT,
+    IMDB_CACHE_SIZE,
+    IMDB_CACHE_TTL,
+    IMDB_NEGATIVE_TTL,
+    SETTINGS_CACHE_SIZE,
+    SETTINGS_CACHE_TTL,
+    TWO_VERIFY_GAP,
+    THREE_VERIFY_GAP,
+    MEMBER_CACHE_SIZE,
+    MEMBER_CACHE_TTL,
+    MEMBER_NEGATIVE_TTL,
+)
 from imdb import Cinemagoer
 import asyncio
-from pyrogram.types import Message
+from pyrogram.types import Message, InlineKeyboardButton
 from pyrogram import enums
 import pytz
 import re
@@ -17,7 +33,11 @@ import os
 from shortzy import Shortzy
 from datetime import datetime
 from typing import Any
-from database.users_chats_db import db
+from database.users_chats_db import db, NOT_VERIFIED, needs_shortener, verified_today
+from database.imdb_cache import imdb_cache
+from database.user_state import user_state
+from Jisshu.util.executor import run_io
+from Jisshu.util.cache import TTLCache
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +45,15 @@ logger.setLevel(logging.INFO)
 
 BANNED = {}
 imdb = Cinemagoer()
+IMDB_SEMAPHORE = asyncio.Semaphore(IMDB_CONCURRENCY)
+IMDB_MEMORY = TTLCache("imdb", IMDB_CACHE_SIZE, IMDB_CACHE_TTL)
+IMDB_INFLIGHT = {}
+# group id -> settings, written through by save_group_settings
+SETTINGS_CACHE = TTLCache("settings", SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL)
+# (channel, user) -> whether the user is a member, refreshed by join_req.py
+MEMBERS = TTLCache("members", MEMBER_CACHE_SIZE, MEMBER_CACHE_TTL)
+# file id -> (size label, cleaned name) shown in result pages
+FILE_ROWS = TTLCache("file_rows", 10000, 86400)
 
 
 class temp(object):
@@ -34,13 +63,11 @@ class temp(object):
     U_NAME = None
     B_NAME = None
     B_LINK = None
-    SETTINGS = {}
-    FILES_ID = {}
     USERS_CANCEL = False
     GROUPS_CANCEL = False
-    CHAT = {}
     BANNED_USERS = []
     BANNED_CHATS = []
+    SETTINGS_WRITES = 0  # settings changes seen, see get_settings
 
 
 def formate_file_name(file_name):
@@ -58,32 +85,163 @@ def formate_file_name(file_name):
 async def is_req_subscribed(bot, query):
     if await db.find_join_req(query.from_user.id):
         return True
-    try:
-        user = await bot.get_chat_member(AUTH_CHANNEL, query.from_user.id)
-    except UserNotParticipant:
-        pass
-    except Exception as e:
-        print(e)
-    else:
-        if user.status != enums.ChatMemberStatus.BANNED:
-            return True
-    return False
+    return await is_subscribed(bot, query.from_user.id, AUTH_CHANNEL)
 
 
 async def is_subscribed(bot, user_id, channel_id):
+    """Channel membership, cached so repeated file clicks skip the API.
+
+    Errors other than "not a participant" are not cached.
+    """
+    key = (int(channel_id), int(user_id))
+    member = MEMBERS.get(key)
+    if member is not None:
+        return member
     try:
         user = await bot.get_chat_member(channel_id, user_id)
     except UserNotParticipant:
-        pass
-    except Exception:
-        pass
+        member = False
+    except Exception as e:
+        print(e)
+        return False
     else:
-        if user.status != enums.ChatMemberStatus.BANNED:
-            return True
-    return False
+        member = user.status != enums.ChatMemberStatus.BANNED
+    MEMBERS.set(key, member, None if member else MEMBER_NEGATIVE_TTL)
+    return member
+
+
+def forget_member(channel_id, user_id):
+    MEMBERS.pop((int(channel_id), int(user_id)))
+
+
+class Access:
+    """What /start needs to know before sending a file to a user.
+
+    The user's stored state is loaded with one query and every channel
+    membership is checked once, concurrently, and remembered for the request.
+    """
+
+    def __init__(self, bot, user_id, settings):
+        self.bot = bot
+        self.user_id = user_id
+        self.settings = settings
+        self.members = {}
+
+    async def load(self, channels=()):
+        state = await user_state.get(self.user_id)
+        self.join_req = bool(state["join_req"])
+        self.misc = dict(NOT_VERIFIED, **(state["misc"] or {}))
+        if state["misc"] is None:
+            # verification updates need the document to exist
+            await db.get_notcopy_user(self.user_id)
+        channels = [c for c in channels if c != AUTH_CHANNEL or not self.join_req]
+        member, self.premium = await asyncio.gather(
+            asyncio.gather(*(self.subscribed(c) for c in channels)),
+            db.check_premium(state["premium"]),
+        )
+        return self
+
+    def subscribed(self, channel):
+        channel = int(channel)
+        if channel not in self.members:
+            self.members[channel] = asyncio.ensure_future(
+                is_subscribed(self.bot, self.user_id, channel)
+            )
+        return self.members[channel]
+
+    async def req_subscribed(self):
+        return self.join_req or await self.subscribed(AUTH_CHANNEL)
+
+    @property
+    def verified(self):
+        return verified_today(self.misc["last_verified"])
+
+    @property
+    def second_verified(self):
+        return verified_today(self.misc["second_time_verified"])
+
+    @property
+    def second_shortener(self):
+        gap = self.settings.get("verify_time", TWO_VERIFY_GAP)
+        return needs_shortener(self.misc, "last_verified", "second_time_verified", gap)
+
+    @property
+    def third_shortener(self):
+        gap = self.settings.get("third_verify_time", THREE_VERIFY_GAP)
+        return needs_shortener(
+            self.misc, "second_time_verified", "third_time_verified", gap
+        )
+
+
+async def imdb_call(func, *args, **kwargs):
+    """Run a blocking Cinemagoer call in the shared thread pool.
+
+    At most IMDB_CONCURRENCY calls run at once. IMDB_TIMEOUT covers waiting
+    for a slot as well, so hung lookups holding every slot cannot stall later
+    callers. A call that times out keeps its slot until the thread really
+    finishes, so the bound holds.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + IMDB_TIMEOUT
+    await asyncio.wait_for(IMDB_SEMAPHORE.acquire(), IMDB_TIMEOUT)
+    future = asyncio.ensure_future(run_io(func, *args, **kwargs))
+    future.add_done_callback(lambda _: IMDB_SEMAPHORE.release())
+    return await asyncio.wait_for(asyncio.shield(future), deadline - loop.time())
+
+
+def imdb_cache_key(query, bulk=False, id=False, file=None):
+    if id:
+        return f"id:{query}"
+    query = " ".join(query.lower().split())
+    year = ""
+    if file is not None and not re.search(r"[1-2]\d{3}$", query):
+        year = list_to_str(re.findall(r"[1-2]\d{3}", file)[:1])
+    return f"{'bulk' if bulk else 'title'}:{query}:{year}"
 
 
 async def get_poster(query, bulk=False, id=False, file=None):
+    """IMDb details of a title (or the candidate titles with bulk=True).
+
+    Results, including "not found", are cached in memory and in Mongo, and
+    concurrent lookups of the same title share one fetch.
+    """
+    key = imdb_cache_key(query, bulk, id, file)
+    value = IMDB_MEMORY.get(key)
+    if value is not None:
+        return value or None
+    if key not in IMDB_INFLIGHT:
+        IMDB_INFLIGHT[key] = asyncio.ensure_future(
+            load_poster(key, query, bulk, id, file)
+        )
+        IMDB_INFLIGHT[key].add_done_callback(lambda _: IMDB_INFLIGHT.pop(key, None))
+    return await asyncio.shield(IMDB_INFLIGHT[key])
+
+
+async def load_poster(key, query, bulk, id, file):
+    found, value = await imdb_cache.get(key)
+    if not found:
+        try:
+            value = await fetch_poster(query, bulk, id, file)
+        except asyncio.TimeoutError:
+            logger.warning(f"IMDb lookup timed out for {query!r}")
+            return None
+        if bulk and value:
+            value = [
+                {
+                    "title": movie.get("title"),
+                    "year": movie.get("year"),
+                    "kind": movie.get("kind"),
+                    "movieID": movie.movieID,
+                }
+                for movie in value
+            ]
+        ttl = IMDB_CACHE_TTL if value else IMDB_NEGATIVE_TTL
+        await imdb_cache.set(key, value or None, ttl)
+    IMDB_MEMORY.set(key, value or False, None if value else IMDB_NEGATIVE_TTL)
+    return value or None
+
+
+async def fetch_poster(query, bulk=False, id=False, file=None):
     if not id:
         query = (query.strip()).lower()
         title = query
@@ -97,7 +255,7 @@ async def get_poster(query, bulk=False, id=False, file=None):
                 year = list_to_str(year[:1])
         else:
             year = None
-        movieid = imdb.search_movie(title.lower(), results=10)
+        movieid = await imdb_call(imdb.search_movie, title.lower(), results=10)
         if not movieid:
             return None
         if year:
@@ -116,7 +274,7 @@ async def get_poster(query, bulk=False, id=False, file=None):
         movieid = movieid[0].movieID
     else:
         movieid = query
-    movie = imdb.get_movie(movieid)
+    movie = await imdb_call(imdb.get_movie, movieid)
     if movie.get("original air date"):
         date = movie["original air date"]
     elif movie.get("year"):
@@ -209,14 +367,49 @@ async def groups_broadcast(chat_id, message, is_pin):
 
 
 async def get_settings(group_id):
-    settings = await db.get_settings(int(group_id))
-    return settings
+    group_id = int(group_id)
+    settings = SETTINGS_CACHE.get(group_id)
+    if settings is None:
+        writes = temp.SETTINGS_WRITES
+        settings = await db.get_settings(group_id)
+        # a change saved while reading may have been missed, don't cache it
+        if writes == temp.SETTINGS_WRITES:
+            SETTINGS_CACHE.set(group_id, settings)
+    return dict(settings)
 
 
 async def save_group_settings(group_id, key, value):
-    current = await get_settings(group_id)
-    current[key] = value
-    await db.update_settings(group_id, current)
+    await update_group_settings(group_id, {key: value})
+
+
+async def update_group_settings(group_id, values):
+    """Set several settings of a group in one round trip"""
+    group_id = int(group_id)
+    await db.update_settings(group_id, values)
+    temp.SETTINGS_WRITES += 1
+    cached = SETTINGS_CACHE.get(group_id)
+    if cached is not None:
+        SETTINGS_CACHE.set(group_id, dict(cached, **values))
+
+
+def forget_settings(group_id):
+    temp.SETTINGS_WRITES += 1
+    SETTINGS_CACHE.pop(int(group_id))
+
+
+async def watch_settings():
+    """Drop cached settings of groups changed by another process"""
+    try:
+        async with db.grp.watch(
+            [{"$match": {"operationType": {"$in": ["update", "replace"]}}}],
+            full_document="updateLookup",
+        ) as stream:
+            async for change in stream:
+                group = change.get("fullDocument") or {}
+                if "id" in group:
+                    forget_settings(group["id"])
+    except Exception as e:
+        logger.error(f"Settings change stream stopped: {e}")
 
 
 def get_size(size):
@@ -229,6 +422,51 @@ def get_size(size):
     return "%.2f %s" % (size, units[i])
 
 
+def file_row(file):
+    """Size label and display name of a file, worked out once per file id"""
+    row = FILE_ROWS.get(file.file_id)
+    if row is None:
+        row = (get_size(file.file_size), formate_file_name(file.file_name))
+        FILE_ROWS.set(file.file_id, row)
+    return row
+
+
+def file_link(chat_id, file_id):
+    return f"https://telegram.dog/{temp.U_NAME}?start=file_{chat_id}_{file_id}"
+
+
+def result_rows(files, chat_id, link_mode, start=1, icon="🔗", req=None):
+    """Buttons and link-mode HTML for a page of results.
+
+    In link mode every file is a numbered link and no file buttons are made,
+    otherwise each file gets a button that opens it in PM (or goes through
+    cfiles when req is given).
+    """
+    if link_mode:
+        links = []
+        for num, file in enumerate(files, start=start):
+            size, name = file_row(file)
+            links.append(
+                f"<b>\n\n{num}. <a href={file_link(chat_id, file.file_id)}>"
+                f"[{size}] {name}</a></b>"
+            )
+        return [], "".join(links)
+    btn = []
+    for file in files:
+        size, name = file_row(file)
+        if req is None:
+            button = InlineKeyboardButton(
+                text=f"{icon} {size}≽ {name}", url=file_link(chat_id, file.file_id)
+            )
+        else:
+            button = InlineKeyboardButton(
+                text=f"{icon} {size}≽ {name}",
+                callback_data=f"cfiles#{req}#{file.file_id}",
+            )
+        btn.append([button])
+    return btn, ""
+
+
 def get_name(name):
     regex = re.sub(r"@\w+", "", name)
     return regex
@@ -351,5 +589,4 @@ def get_readable_time(seconds):
 
 async def save_default_settings(id):
     await db.reset_group_settings(id)
-    current = await db.get_settings(id)
-    temp.SETTINGS.update({id: current})
+    forget_settings(id)